@@ -19,6 +19,14 @@ import os
 BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_URL = '/media/'  # URL to access media files
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Media is only reachable through signed URLs (inventory_app/media.py). In production let the web
+# server send the files: 'x-accel-redirect' for nginx (an `internal` location at
+# MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT) or 'x-sendfile' for Apache/lighttpd.
+# Unset, Django streams them itself, with range support.
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_URL_TTL = timedelta(days=7)  # Minimum lifetime of a signed media URL
+MEDIA_URL_ROUNDING = timedelta(days=1)  # Expiries are rounded up to this, so URLs stay stable and cacheable
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -64,6 +72,8 @@ SWAGGER_SETTINGS = {
     },
 }
 
+OPENAPI_SCHEMA_DIR = os.path.join(BASE_DIR, 'openapi')  # Written by `manage.py build_openapi_schema`; /swagger/ and /redoc/ use it when DEBUG is off
+
 GRAPH_MODELS = {
   'all_applications': True,
   'group_models': True,
@@ -91,6 +101,10 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ),
+    # Token-bucket throttling, see TOKEN_BUCKET_RATES below
+    'DEFAULT_THROTTLE_CLASSES': (
+        'inventory_app.throttling.TokenBucketThrottle',
+    ),
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.JSONRenderer',  # Ensures JSON responses by default
          'rest_framework.renderers.BrowsableAPIRenderer',  # Ensures browsable API
@@ -98,6 +112,17 @@ REST_FRAMEWORK = {
 
 }
 
+# Token-bucket rates per view scope (`throttle_scope`) and user class, as "<tokens>/<period>".
+# A bucket holds up to <tokens> and refills at <tokens> per <period>; views with a higher
+# `throttle_cost` take more tokens per request. None means unlimited.
+TOKEN_BUCKET_RATES = {
+    'default': {'anon': '60/min', 'user': '600/min', 'staff': None},
+    'registration': {'anon': '10/hour', 'user': '10/hour', 'staff': None},
+    'inventory_levels': {'anon': '30/min', 'user': '300/min', 'staff': '3000/min'},
+    'change_logs': {'anon': '30/min', 'user': '300/min', 'staff': '3000/min'},
+}
+TOKEN_BUCKET_SHARED_CACHE = False  # Keep buckets in the Django cache so all workers share them
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),  # Access token lifetime
     'REFRESH_TOKEN_LIFETIME': timedelta(days=2),     # Refresh token lifetime
@@ -111,12 +136,79 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'inventory_app.middleware.RateLimitHeadersMiddleware',  # X-RateLimit-* headers from TokenBucketThrottle
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'inventory_app.middleware.ReplicaRoutingMiddleware',  # Safe-method reads go to the read replicas
+    'inventory_app.middleware.RequestProfilingMiddleware',  # On-demand profiling for staff (X-Profile header)
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Request profiling: staff send "X-Profile: 1" (cProfile) or "X-Profile: sample"
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')  # On-disk ring buffer of stored profiles
+PROFILING_MAX_FILES = 50  # Oldest profiles are removed beyond this count
+PROFILING_SAMPLE_INTERVAL = 0.005  # Seconds between stack samples in "sample" mode
+
+# Idempotency-Key support for write endpoints
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)  # How long a stored response is replayed; purge with `manage.py purge_idempotency_keys`
+IDEMPOTENCY_LOCK_TIMEOUT = timedelta(minutes=1)  # An unfinished request older than this is treated as abandoned
+
+# Deleted items and users are hidden at once and removed later by `manage.py purge_deleted`
+PURGE_CHUNK_SIZE = 1000  # Rows per transaction when soft-deleting and purging
+PURGE_CHUNK_PAUSE_SECONDS = 0  # Pause between purge chunks, to spare replicas on busy systems
+
+# Largest id list accepted by /api/inventory/?ids= and /api/inventory/multi-get/
+MULTI_GET_MAX_IDS = 500
+
+# SKU/barcode lookups (/api/inventory/by-code/) keep recently scanned items in a per-process LRU cache
+ITEM_CODE_CACHE_SIZE = 10000  # Entries per process; 0 disables the cache
+ITEM_CODE_CACHE_TTL = 5  # Seconds an entry is served; bounds how stale a change made by another process can be
+
+# Typeahead suggestions (/api/inventory/autocomplete/) from a per-process prefix index of item names
+AUTOCOMPLETE_LIMIT = 10  # Suggestions returned when the request sets no limit (at most 50)
+AUTOCOMPLETE_MAX_ENTRIES = 200000  # Index entries (one per word of each name) kept per process; least recently used owners are dropped beyond it
+AUTOCOMPLETE_REFRESH_SECONDS = 2  # How often an index picks up changes made by other processes
+
+# Background jobs (`manage.py run_jobs`, status at /api/jobs/)
+JOB_WORKERS = 2  # Jobs run at once per worker command
+JOB_POOL = 'process'  # 'process' for CPU-bound tasks, 'thread' to share one process
+JOB_POLL_SECONDS = 2  # How often an idle worker looks for ready jobs
+JOB_MAX_ATTEMPTS = 3  # Attempts per job before it is marked failed
+JOB_RETRY_BACKOFF_SECONDS = 30  # Delay before the first retry, doubled for each further one
+JOB_RETRY_BACKOFF_MAX_SECONDS = 3600  # Longest delay between retries
+JOB_STALE_SECONDS = 300  # A running job whose worker has been silent this long is run again
+
+# Most sub-requests accepted by /api/batch/
+BATCH_MAX_REQUESTS = 25
+
+# Bulk item updates (admin actions and /api/inventory/bulk-update/) run in chunks of this many rows
+BULK_UPDATE_CHUNK_SIZE = 500
+
+# Default price bucket width for the histogram in /api/inventory-levels/facets/ (?price_bucket_size= overrides it)
+FACET_PRICE_BUCKET_SIZE = 100
+
+# Consumption forecasts (`manage.py forecast_inventory`, served at /api/inventory/forecasts/)
+FORECAST_WINDOW_DAYS = 28  # Days of change-log history averaged per item
+FORECAST_LEAD_TIME_DAYS = 7  # Days between reordering and restocking
+FORECAST_SERVICE_Z = 1.65  # Safety stock in standard deviations of daily consumption (about 95% of lead times without a stockout)
+FORECAST_CHUNK_SIZE = 2000  # Items computed per pass
+
+# Delta sync (/api/inventory/sync/)
+SYNC_BATCH_SIZE = 500  # Changes returned per sync request
+SYNC_SETTLE_SECONDS = 5  # Changes newer than this are held back until concurrent transactions have committed
+SYNC_TOMBSTONE_TTL = timedelta(days=30)  # Deletions kept for sync; older cursors must resync. Purge with `manage.py purge_sync_tombstones`
+
+# Change feed (/api/async/inventory/changes/, ASGI only): one poller per process fans new change logs out to all streams
+CHANGE_FEED_POLL_SECONDS = 1  # How often the poller looks for new change logs
+CHANGE_FEED_BATCH_SIZE = 500  # Change logs read per poll
+CHANGE_FEED_GAP_SECONDS = 10  # How long a skipped id (uncommitted transaction) is waited for
+CHANGE_FEED_QUEUE_SIZE = 1000  # Events buffered per stream before a slow client is disconnected
+CHANGE_FEED_REPLAY_LIMIT = 1000  # Missed logs replayed on reconnect; beyond this the client gets a "reset" event
+CHANGE_FEED_HEARTBEAT_SECONDS = 15  # Keep-alive comment interval on idle streams
+CHANGE_FEED_MAX_SECONDS = 300  # Streams are closed after this long; clients reconnect with Last-Event-ID
+CHANGE_FEED_RETRY_MS = 2000  # Reconnect delay suggested to EventSource clients
+
 ROOT_URLCONF = 'Inventory_Manager.urls'
 AUTH_USER_MODEL = 'inventory_app.CustomUser'  # Set the custom user model
 
@@ -156,6 +248,56 @@ DATABASES = {
     }
 }
 
+# Read replicas: comma-separated hosts in MYSQL_REPLICA_HOSTS, each added as "replica_<n>".
+# Reads from safe requests (and code wrapped in routers.replica_reads()) go to a replica;
+# writes, transactions and recently-writing users stay on the primary.
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('MYSQL_REPLICA_HOSTS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+# Local routing without MySQL: SQLITE_REPLICAS=<n> runs on db.sqlite3 with n SQLite files standing in
+# for the replicas ("replica_<n>"). Nothing replicates into them; the tests mirror them to the test
+# database (`SQLITE_REPLICAS=2 python manage.py test inventory_app`).
+if os.environ.get('SQLITE_REPLICAS'):
+    DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(BASE_DIR, 'db.sqlite3')}}
+    DATABASE_REPLICAS = []
+    for index in range(int(os.environ['SQLITE_REPLICAS'])):
+        alias = f'replica_{index}'
+        DATABASES[alias] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(BASE_DIR, f'{alias}.sqlite3'), 'TEST': {'MIRROR': 'default'}}
+        DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['inventory_app.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = 5  # Read-your-writes window after a user writes
+REPLICA_PIN_CACHE = 'replica_pins'  # Cache holding those pins; it must be shared by every worker process
+REPLICA_RETRY_SECONDS = 30  # How long an unreachable replica is skipped before retrying
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    # Read-your-writes pins must be seen by whichever worker serves the user's next request, so
+    # they live in the primary database (`manage.py createcachetable`). Point this alias at Redis or
+    # Memcached instead where one is available.
+    'replica_pins': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'replica_pin_cache'},
+}
+
+# New passwords are hashed with the first hasher; the others still verify existing hashes.
+# Set PASSWORD_HASHER to e.g. 'django.contrib.auth.hashers.Argon2PasswordHasher' (needs argon2-cffi).
+PASSWORD_HASHERS = list(dict.fromkeys([
+    os.environ.get('PASSWORD_HASHER', 'inventory_app.hashers.ConfigurablePBKDF2PasswordHasher'),
+    'inventory_app.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]))
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 600000))  # PBKDF2-SHA256 work factor (OWASP minimum); existing hashes are upgraded or downgraded on login
+
+# Bulk user provisioning (/api/users/provision/ and `manage.py provision_users`)
+PROVISION_HASH_WORKERS = None  # Processes hashing passwords; None uses every CPU
+PROVISION_BATCH_SIZE = 1000  # Users per INSERT
+PROVISION_MAX_ROWS = 5000  # Largest CSV accepted over HTTP; the command has no limit
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -17,7 +17,6 @@ Including another URLconf
 
 from django.contrib import admin
 from django.conf import settings
-from django.conf.urls.static import static
 from django.urls import path, include
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -28,21 +27,9 @@ from rest_framework_simplejwt.views import (
 from django.urls import re_path
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 
-
-schema_view = get_schema_view(
-   openapi.Info(
-      title="INVENTORY MANAGEMENT API",
-      default_version='v1',
-      description="Test description",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="elijahosas@gmail.com"),
-      license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
+from inventory_app.media import protected_media
+from inventory_app.schema import API_INFO, PrebuiltReDocRenderer, PrebuiltSwaggerUIRenderer, current_schema, prebuilt_schema, schema_ui
 
 
 urlpatterns = [
@@ -56,10 +43,24 @@ urlpatterns = [
 
     # Browsable API login/logout
     path('api-auth/', include('rest_framework.urls')),  # REST framework authentication
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=600), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=600), name='schema-redoc'),
 
+    # OpenAPI schema, prebuilt by `manage.py build_openapi_schema`
+    path('openapi/', current_schema, name='openapi-schema-current'),  # Redirects to the current schema file
+    path('openapi/<str:name>', prebuilt_schema, name='openapi-schema'),  # Versioned schema file, cached forever
+
+    # Uploaded images, behind signed URLs; the file itself is sent by the front server (MEDIA_SERVE_MODE)
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), protected_media, name='protected_media'),
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # Generate the schema on each request, so it follows code changes during development
+    schema_view = get_schema_view(API_INFO, public=True, permission_classes=(permissions.AllowAny,))
+    urlpatterns += [
+        path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
+        path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    ]
+else:
+    urlpatterns += [
+        path('swagger/', schema_ui, {'renderer_class': PrebuiltSwaggerUIRenderer}, name='schema-swagger-ui'),
+        path('redoc/', schema_ui, {'renderer_class': PrebuiltReDocRenderer}, name='schema-redoc'),
+    ]
@@ -1,7 +1,16 @@
 # admin.py
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Category, InventoryItem, InventoryChangeLog
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from .models import CustomUser, Category, InventoryItem, InventoryChangeLog, Job
+from .bulk import bulk_update_items, PRICE_PERCENT, PRICE_AMOUNT, THRESHOLD, CATEGORY
+from .deletion import soft_delete_items, soft_delete_user
+from .jobs import PRIVATE_ARGS_TASKS, cancel_job
 from django.utils.html import format_html
 import locale
 
@@ -12,14 +21,99 @@ except locale.Error:
     # Handle locale setting error if locale is not available
     print("Locale setting for Nigeria is not available on this system.")
 
+# Sidebar filter for large related tables: instead of listing every related object it
+# renders a select2 box backed by the admin autocomplete view of the related model.
+class AutocompleteFilter(admin.RelatedFieldListFilter):
+    template = 'admin/inventory_app/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.admin_site = model_admin.admin_site
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def field_choices(self, field, request, model_admin):
+        # Only the selected object is loaded; the rest come from the autocomplete view.
+        if not self.lookup_val:
+            return []
+        return field.get_choices(include_blank=False, limit_choices_to={'pk__in': self.lookup_val})
+
+    def has_output(self):
+        return True
+
+    def widget(self):
+        related_model = self.field.remote_field.model
+        form_field = forms.ModelChoiceField(
+            queryset=related_model._default_manager.all(),
+            required=False,
+            widget=AutocompleteSelect(self.field, self.admin_site),
+        )
+        value = self.lookup_val[0] if self.lookup_val else None
+        return form_field.widget.render(self.lookup_kwarg, value, attrs={'id': f'filter_{self.lookup_kwarg}'})
+
+
+# Adds the select2 assets used by AutocompleteFilter to the changelist page.
+class AutocompleteFilterMixin:
+    @property
+    def media(self):
+        return super().media + AutocompleteSelect(None, self.admin_site).media
+
+
+# Uses the database's table statistics instead of COUNT(*) for unfiltered changelists
+# on large tables. Filtered lists still get an exact count. Hiding soft-deleted rows does
+# not count as a filter: the estimate then includes the few rows waiting for purge_deleted.
+class EstimatedCountPaginator(Paginator):
+    ESTIMATE_THRESHOLD = 100000  # Below this an exact count is cheap enough
+
+    @cached_property
+    def count(self):
+        if self._is_unfiltered(self.object_list):
+            estimate = self._estimated_count(self.object_list.db, self.object_list.model._meta.db_table)
+            if estimate is not None and estimate >= self.ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def _is_unfiltered(queryset):
+        where = queryset.query.where
+        if not where:
+            return True
+        model = queryset.model
+        if not any(field.name == 'deleted_at' for field in model._meta.get_fields()):
+            return False
+        return where == model._base_manager.filter(deleted_at__isnull=True).query.where
+
+    @staticmethod
+    def _estimated_count(using, table):
+        connection = connections[using]
+        if connection.vendor == 'mysql':
+            sql = "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s"
+        elif connection.vendor == 'postgresql':
+            sql = "SELECT reltuples::bigint FROM pg_class WHERE relname = %s"
+        else:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] is not None else None
+
+
+# Deletes from the admin are soft deletes (see deletion.py). The confirmation page lists only
+# the selected objects instead of collecting every related row, which is what made it slow.
+class SoftDeleteAdminMixin:
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        return [str(obj) for obj in objs], {self.model._meta.verbose_name_plural: len(objs)}, set(), []
+
+
 # Customizing the CustomUser admin interface
 @admin.register(CustomUser)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(SoftDeleteAdminMixin, UserAdmin):
     model = CustomUser
     list_display = ('id', 'email', 'username', 'first_name', 'last_name', 'is_staff', 'is_active')
     list_filter = ('is_staff', 'is_active')
     search_fields = ('email', 'username', 'first_name', 'last_name')
     ordering = ('email',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # Avoids a second COUNT(*) over the whole table
     
     fieldsets = (
         (None, {'fields': ('username', 'email', 'password', 'profile_picture')}),
@@ -35,21 +129,44 @@ class CustomUserAdmin(UserAdmin):
         ),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(deleted_at__isnull=True)
+
+    def delete_model(self, request, obj):
+        soft_delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            soft_delete_user(user)
+
 
 # Registering the Category model
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('id', 'category', 'cat_description')
+    list_display = ('id', 'category', 'cat_description', 'item_count', 'total_quantity', 'total_value')
+    readonly_fields = ('item_count', 'total_quantity', 'total_value')
     search_fields = ('category',)
     ordering = ('category',)
 
 
+# Extra inputs shown next to the action dropdown on the item changelist
+class InventoryItemActionForm(ActionForm):
+    value = forms.DecimalField(required=False, max_digits=10, decimal_places=2, label='Value')
+    category = forms.ModelChoiceField(queryset=Category.objects.all(), required=False, label='Category')
+    reason = forms.CharField(required=False, max_length=255, label='Reason')
+
+
 # Registering the InventoryItem model
 @admin.register(InventoryItem)
-class InventoryItemAdmin(admin.ModelAdmin):
-    list_display = ('id', 'item_name', 'category', 'item_qty', 'formatted_price', 'owner', 'date_added', 'last_updated', 'low_stock_threshold' ,'item_image')
-    list_filter = ('category', 'owner')
-    search_fields = ('item_name', 'category__category', 'owner__email')
+class InventoryItemAdmin(SoftDeleteAdminMixin, AutocompleteFilterMixin, admin.ModelAdmin):
+    list_display = ('id', 'item_name', 'sku', 'category', 'item_qty', 'formatted_price', 'owner', 'date_added', 'last_updated', 'low_stock_threshold' ,'item_image')
+    list_filter = ('category', ('owner', AutocompleteFilter))
+    list_select_related = ('category', 'owner')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # Avoids a second COUNT(*) over the whole table
+    action_form = InventoryItemActionForm
+    actions = ['change_price_by_percent', 'change_price_by_amount', 'set_low_stock_threshold', 'set_category']
+    search_fields = ('item_name', '=sku', 'category__category', 'owner__email')
     ordering = ('-date_added',)
     readonly_fields = ('date_added', 'last_updated')
     
@@ -72,13 +189,65 @@ class InventoryItemAdmin(admin.ModelAdmin):
         return ""
     item_image_thumbnail.short_description = 'Thumbnail'
 
+    def delete_model(self, request, obj):
+        soft_delete_items(InventoryItem.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        soft_delete_items(queryset)
+
+    # Bulk actions: set-based updates with one batch of change-log rows per chunk
+    def _run_bulk_update(self, request, queryset, operation, value):
+        if value is None:
+            self.message_user(request, "Enter a value for this action.", messages.ERROR)
+            return
+        reason = request.POST.get('reason') or 'Bulk update from admin'
+        result = bulk_update_items(queryset, operation, value, request.user, reason)
+        self.message_user(request, f"Updated {result['updated']} items, skipped {result['skipped']}.", messages.SUCCESS)
+
+    def _get_action_value(self, request):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        return form.cleaned_data if form.is_valid() else {}
+
+    @admin.action(description='Change price by percentage (Value = %%)')
+    def change_price_by_percent(self, request, queryset):
+        value = self._get_action_value(request).get('value')
+        if value is not None and value <= -100:
+            self.message_user(request, "A percentage change must be greater than -100.", messages.ERROR)
+            return
+        self._run_bulk_update(request, queryset, PRICE_PERCENT, value)
+
+    @admin.action(description='Change price by amount (Value = ₦)')
+    def change_price_by_amount(self, request, queryset):
+        self._run_bulk_update(request, queryset, PRICE_AMOUNT, self._get_action_value(request).get('value'))
+
+    @admin.action(description='Set low stock threshold (Value)')
+    def set_low_stock_threshold(self, request, queryset):
+        value = self._get_action_value(request).get('value')
+        if value is not None and (value < 0 or value != int(value)):
+            self.message_user(request, "The threshold must be a whole number of at least 0.", messages.ERROR)
+            return
+        self._run_bulk_update(request, queryset, THRESHOLD, value)
+
+    @admin.action(description='Move to category')
+    def set_category(self, request, queryset):
+        category = self._get_action_value(request).get('category')
+        if category is None:
+            self.message_user(request, "Choose a category for this action.", messages.ERROR)
+            return
+        self._run_bulk_update(request, queryset, CATEGORY, category)
+
 
 # Registering the InventoryChangeLog model
 @admin.register(InventoryChangeLog)
-class InventoryChangeLogAdmin(admin.ModelAdmin):
+class InventoryChangeLogAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = ('id', 'inventory_item', 'change_quantity', 'change_price', 'reason', 'date_changed', 'changed_by')
     search_fields = ('inventory_item__item_name', 'changed_by__email')
-    list_filter = ('inventory_item', 'changed_by')
+    list_filter = (('inventory_item', AutocompleteFilter), ('changed_by', AutocompleteFilter))
+    list_select_related = ('inventory_item', 'changed_by')
+    date_hierarchy = 'date_changed'  # Indexed, so drilling down by date stays cheap
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # Avoids a second COUNT(*) over the whole table
     ordering = ('-date_changed',)
     readonly_fields = ('date_changed',)
     
@@ -96,4 +265,30 @@ class InventoryChangeLogAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         return False
 
-    
\ No newline at end of file
+    
+
+
+# Registering the Job model. Jobs are enqueued through the API or code; here they can be followed and cancelled.
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'task', 'status', 'attempts', 'progress', 'progress_message', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'task')
+    list_select_related = ('created_by',)
+    ordering = ('-created_at',)
+    actions = ['cancel_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_exclude(self, request, obj=None):
+        if obj is not None and obj.task in PRIVATE_ARGS_TASKS:
+            return ('args',)
+        return super().get_exclude(request, obj)
+
+    @admin.action(description='Cancel selected queued jobs')
+    def cancel_jobs(self, request, queryset):
+        cancelled = sum(cancel_job(pk) for pk in queryset.values_list('pk', flat=True))
+        self.message_user(request, f"{cancelled} jobs cancelled.", messages.SUCCESS)
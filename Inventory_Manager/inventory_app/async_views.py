@@ -0,0 +1,250 @@
+import asyncio
+import json
+import math
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import models
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .models import Category, InventoryItem, InventoryChangeLog
+from .serializers import CategorySerializer, InventoryItemSerializer, InventoryChangeLogSerializer
+from .feed import FEED_FIELDS, change_feed, get_events
+from .routers import resolve_pin
+
+
+# Async read-only counterparts of the list/detail views in views.py, for deployments
+# running the ASGI app (asgi.py) under uvicorn. They use Django's async ORM, so a slow
+# query waits on the event loop instead of holding a worker thread.
+class AsyncAPIView(View):
+    http_method_names = ['get', 'head', 'options']
+    serializer_class = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Reuse the DRF authenticators (JWT, session, basic) and throttles configured in settings.
+        self.drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+        try:
+            user, wait = await sync_to_async(self.check_request)()
+        except exceptions.APIException as exc:
+            # Invalid or expired credentials (InvalidToken, AuthenticationFailed)
+            return self.authentication_error(exc.detail, exc.status_code)
+        if not user.is_authenticated:
+            return self.authentication_error('Authentication credentials were not provided.', 401)
+        if wait is not None:
+            response = self.error('Request was throttled.', status=429)
+            response['Retry-After'] = str(math.ceil(wait))
+            return response
+        return await super().dispatch(request, *args, **kwargs)
+
+    def check_request(self):
+        user = self.drf_request.user
+        if user.is_authenticated:
+            resolve_pin(user)  # Replica routing; the router cannot look it up from the event loop
+            for throttle in (throttle_class() for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES):
+                if not throttle.allow_request(self.drf_request, self):
+                    return user, throttle.wait() or 0
+        return user, None
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def serialize(self, data, many=False):
+        return self.serializer_class(data, many=many, context={'request': self.drf_request}).data
+
+    @staticmethod
+    def respond(data, status=200):
+        return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+    def error(self, detail, status):
+        # Like DRF, a structured detail (simplejwt's token errors) is the body itself
+        return self.respond(detail if isinstance(detail, dict) else {'detail': detail}, status=status)
+
+    def authentication_error(self, detail, status):
+        response = self.error(detail, status)
+        if status == 401:
+            # As in APIView.get_authenticate_header(): the first authenticator names the scheme
+            authenticators = self.drf_request.authenticators
+            header = authenticators[0].authenticate_header(self.drf_request) if authenticators else None
+            if header:
+                response['WWW-Authenticate'] = header
+        return response
+
+
+class AsyncListView(AsyncAPIView):
+    ordering = ('id',)
+
+    async def get(self, request, *args, **kwargs):
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        try:
+            page = int(request.GET.get('page', 1))
+        except ValueError:
+            page = 0
+        if page < 1:
+            return self.error('Invalid page.', status=404)
+
+        queryset = self.get_queryset()
+        offset = (page - 1) * page_size
+
+        # Two queries, one after the other: Django runs async ORM calls on the request's single
+        # database thread, so awaiting them together would not overlap them.
+        count = await queryset.acount()
+        results = [obj async for obj in queryset.order_by(*self.ordering)[offset:offset + page_size].aiterator()]
+        if page > 1 and not results:
+            return self.error('Invalid page.', status=404)
+
+        url = request.build_absolute_uri()
+        next_url = replace_query_param(url, 'page', page + 1) if offset + page_size < count else None
+        if page == 1:
+            previous_url = None
+        elif page == 2:
+            previous_url = remove_query_param(url, 'page')
+        else:
+            previous_url = replace_query_param(url, 'page', page - 1)
+        return self.respond({
+            'count': count,
+            'next': next_url,
+            'previous': previous_url,
+            'results': self.serialize(results, many=True),
+        })
+
+
+class AsyncDetailView(AsyncAPIView):
+    async def get(self, request, pk, *args, **kwargs):
+        try:
+            instance = await self.get_queryset().aget(pk=pk)
+        except models.ObjectDoesNotExist:
+            return self.error('No object found matching the query.', status=404)
+        return self.respond(self.serialize(instance))
+
+
+# Inventory item views
+class InventoryItemAsyncMixin:
+    serializer_class = InventoryItemSerializer
+
+    def get_queryset(self):
+        # Nested category/owner data must be joined up front; lazy loads are not allowed here.
+        queryset = InventoryItem.objects.select_related('category', 'owner')
+        if self.drf_request.user.is_staff:
+            return queryset
+        return queryset.filter(owner=self.drf_request.user)
+
+class AsyncInventoryItemListView(InventoryItemAsyncMixin, AsyncListView):
+    pass
+
+class AsyncInventoryItemDetailView(InventoryItemAsyncMixin, AsyncDetailView):
+    pass
+
+class AsyncLowStockItemsView(AsyncListView):
+    serializer_class = InventoryItemSerializer
+
+    def get_queryset(self):
+        return InventoryItem.objects.select_related('category', 'owner').filter(item_qty__lt=models.F('low_stock_threshold'))
+
+# Category views
+class CategoryAsyncMixin:
+    serializer_class = CategorySerializer
+
+    def get_queryset(self):
+        return Category.objects.all()
+
+class AsyncCategoryListView(CategoryAsyncMixin, AsyncListView):
+    pass
+
+class AsyncCategoryDetailView(CategoryAsyncMixin, AsyncDetailView):
+    pass
+
+# Inventory change log views
+class InventoryChangeLogAsyncMixin:
+    serializer_class = InventoryChangeLogSerializer
+
+    def get_queryset(self):
+        queryset = InventoryChangeLog.objects.select_related('inventory_item__category', 'inventory_item__owner', 'changed_by')
+        if self.drf_request.user.is_staff:
+            return queryset
+        return queryset.filter(changed_by=self.drf_request.user)
+
+class AsyncInventoryChangeLogListView(InventoryChangeLogAsyncMixin, AsyncListView):
+    ordering = ('-date_changed', '-id')
+    throttle_scope = 'change_logs'
+    throttle_cost = 5
+
+class AsyncInventoryChangeLogDetailView(InventoryChangeLogAsyncMixin, AsyncDetailView):
+    pass
+
+# Change feed: a server-sent events stream of item changes and low-stock transitions for the
+# user's items (every item for staff), fed by the shared poller in feed.py. Clients resume
+# with the standard Last-Event-ID header (or ?last_event_id=), which is an InventoryChangeLog id.
+class AsyncChangeFeedView(AsyncAPIView):
+    throttle_scope = 'change_feed'
+
+    async def get(self, request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return self.error('The change feed needs the ASGI server (asgi.py).', status=501)
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return self.error('Invalid event id.', status=400)
+
+        user = self.drf_request.user
+        response = StreamingHttpResponse(self.stream(None if user.is_staff else user.pk, last_event_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+        return response
+
+    async def stream(self, owner_id, last_event_id):
+        subscriber = change_feed.subscribe(owner_id)
+        try:
+            yield f"retry: {settings.CHANGE_FEED_RETRY_MS}\n\n"
+            replayed = set()
+            if last_event_id is not None:
+                # Logs after the poller's starting point are also queued live; send those once.
+                await change_feed.ready.wait()
+                async for event in self.replay(owner_id, last_event_id, replayed):
+                    yield event
+
+            deadline = time.monotonic() + settings.CHANGE_FEED_MAX_SECONDS
+            while time.monotonic() < deadline:
+                if subscriber.overflowed and subscriber.queue.empty():
+                    break  # Fell behind; the client reconnects and replays from its last id
+                try:
+                    log_id, events = await asyncio.wait_for(subscriber.queue.get(), settings.CHANGE_FEED_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if log_id not in replayed:
+                    yield self.format_events(log_id, events)
+            # Streams are recycled so expired credentials are noticed on reconnect
+        finally:
+            change_feed.unsubscribe(subscriber)
+
+    async def replay(self, owner_id, last_event_id, replayed):
+        limit = settings.CHANGE_FEED_REPLAY_LIMIT
+        queryset = InventoryChangeLog.objects.filter(id__gt=last_event_id)
+        if owner_id is not None:
+            queryset = queryset.filter(inventory_item__owner_id=owner_id)
+        rows = [row async for row in queryset.order_by('id').values(*FEED_FIELDS)[:limit + 1]]
+        if len(rows) > limit:
+            # Too far behind to replay: tell the client to reload its data and carry on live from here
+            latest = await InventoryChangeLog.objects.order_by('-id').values_list('id', flat=True).afirst()
+            yield self.format_events(latest, [('reset', {})])
+            replayed.update(row['id'] for row in rows)
+            return
+        for row in rows:
+            replayed.add(row['id'])
+            yield self.format_events(row['id'], get_events(row))
+
+    @staticmethod
+    def format_events(log_id, events):
+        return ''.join(
+            f"id: {log_id}\nevent: {name}\ndata: {json.dumps(data, cls=JSONEncoder)}\n\n"
+            for name, data in events
+        )
@@ -0,0 +1,182 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import InventoryItem
+
+WORD_RE = re.compile(r'\w+')
+
+
+# Typeahead suggestions for item pickers (/api/inventory/autocomplete/) from an in-process
+# prefix index per owner, built on the first request for that owner. Each item name is indexed
+# from the start of every word ("coca cola 500ml", "cola 500ml", "500ml"), so "cola" and
+# "coca c" both find it; a lookup is a bisect into a sorted list, whatever the catalog size.
+#
+# Saves and deletes in this process update the index when they commit. Every
+# AUTOCOMPLETE_REFRESH_SECONDS an index also applies the rows changed since its last refresh
+# (one range query on the owner/last_updated index), which picks up writes made by other
+# processes. Indexes are kept least recently used first and evicted once their entries
+# together exceed AUTOCOMPLETE_MAX_ENTRIES; an owner too large to fit is answered by the database.
+def normalize(text):
+    return ' '.join(WORD_RE.findall(text.casefold()))
+
+
+def _keys(name):
+    words = normalize(name).split(' ')
+    return [' '.join(words[start:]) for start in range(len(words)) if words[start]]
+
+
+class OwnerIndex:
+    def __init__(self, owner_id):
+        self.owner_id = owner_id
+        self.items = {}  # item id -> (item_name, item_qty)
+        self.entries = []  # Sorted (key, item id)
+        self.since = None  # Changes from here on are applied by the next refresh
+        self.refreshed_at = 0.0
+        self.lock = threading.Lock()
+
+    def load(self):
+        self.since = self._now()
+        rows = InventoryItem.objects.filter(owner_id=self.owner_id).values_list('pk', 'item_name', 'item_qty')
+        for pk, name, qty in rows.iterator(chunk_size=2000):
+            self.items[pk] = (name, qty)
+        self.entries = sorted((key, pk) for pk, (name, _) in self.items.items() for key in _keys(name))
+        self.refreshed_at = time.monotonic()
+
+    def refresh(self):
+        with self.lock:
+            if time.monotonic() - self.refreshed_at < settings.AUTOCOMPLETE_REFRESH_SECONDS:
+                return  # Another request got here first
+            since, self.since = self.since, self._now()
+            rows = InventoryItem.all_objects.filter(owner_id=self.owner_id, last_updated__gte=since)
+            for pk, name, qty, deleted_at in rows.values_list('pk', 'item_name', 'item_qty', 'deleted_at'):
+                if deleted_at is None:
+                    self._put(pk, name, qty)
+                else:
+                    self._remove(pk)
+            self.refreshed_at = time.monotonic()
+
+    def suggest(self, prefix, limit):
+        with self.lock:
+            found = []
+            position = bisect_left(self.entries, (prefix,))
+            while position < len(self.entries) and len(found) < limit:
+                key, pk = self.entries[position]
+                if not key.startswith(prefix):
+                    break
+                if pk not in found:
+                    found.append(pk)
+                position += 1
+            return [(pk, *self.items[pk]) for pk in found]
+
+    def put(self, pk, name, qty):
+        with self.lock:
+            self._put(pk, name, qty)
+
+    def remove(self, pk):
+        with self.lock:
+            self._remove(pk)
+
+    def _put(self, pk, name, qty):
+        previous = self.items.get(pk)
+        if previous is not None and previous[0] == name:
+            self.items[pk] = (name, qty)  # Only the quantity changed
+            return
+        self._remove(pk)
+        self.items[pk] = (name, qty)
+        for key in _keys(name):
+            insort(self.entries, (key, pk))
+
+    def _remove(self, pk):
+        previous = self.items.pop(pk, None)
+        if previous is None:
+            return
+        for key in _keys(previous[0]):
+            position = bisect_left(self.entries, (key, pk))
+            if position < len(self.entries) and self.entries[position] == (key, pk):
+                del self.entries[position]
+
+    def _now(self):
+        # Writes commit a little after they stamp last_updated; look back far enough to see them
+        return timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+
+class AutocompleteIndex:
+    def __init__(self):
+        self._owners = OrderedDict()  # owner id -> OwnerIndex, least recently used first
+        self._too_large = set()  # Owners answered by the database
+        self._lock = threading.Lock()
+
+    def suggest(self, owner_id, query, limit):
+        """[(id, item_name, item_qty)] of up to ``limit`` items whose name has a word starting with ``query``."""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        index = self._get(owner_id)
+        if index is None:
+            items = InventoryItem.objects.filter(owner_id=owner_id, item_name__istartswith=query.strip()).order_by('item_name')
+            return list(items.values_list('pk', 'item_name', 'item_qty')[:limit])
+        if time.monotonic() - index.refreshed_at >= settings.AUTOCOMPLETE_REFRESH_SECONDS:
+            index.refresh()
+        return index.suggest(prefix, limit)
+
+    def item_saved(self, item):
+        """Apply a saved item to its owner's index, if loaded, once the transaction commits."""
+        if item.deleted_at is not None:
+            self.items_deleted([(item.owner_id, item.pk)])
+            return
+        owner_id, pk, name, qty = item.owner_id, item.pk, item.item_name, item.item_qty
+        transaction.on_commit(lambda: self._apply(owner_id, 'put', pk, name, qty))
+
+    def items_deleted(self, items):
+        """Drop (owner id, item id) pairs from the loaded indexes once the transaction commits."""
+        items = list(items)
+
+        def remove():
+            for owner_id, pk in items:
+                self._apply(owner_id, 'remove', pk)
+        transaction.on_commit(remove)
+
+    def clear(self):
+        with self._lock:
+            self._owners.clear()
+            self._too_large.clear()
+
+    def _apply(self, owner_id, method, *args):
+        with self._lock:
+            index = self._owners.get(owner_id)
+        if index is not None:
+            getattr(index, method)(*args)
+
+    def _get(self, owner_id):
+        with self._lock:
+            if owner_id in self._too_large:
+                return None
+            index = self._owners.get(owner_id)
+            if index is not None:
+                self._owners.move_to_end(owner_id)
+                return index
+
+        index = OwnerIndex(owner_id)
+        index.load()
+        max_entries = settings.AUTOCOMPLETE_MAX_ENTRIES
+        with self._lock:
+            if len(index.entries) > max_entries:
+                self._too_large.add(owner_id)
+                return None
+            self._owners[owner_id] = index
+            total = sum(len(loaded.entries) for loaded in self._owners.values())
+            while total > max_entries:
+                _, evicted = self._owners.popitem(last=False)
+                total -= len(evicted.entries)
+        return index
+
+
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,101 @@
+import io
+import json
+import logging
+from urllib.parse import urlsplit
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+# Request details copied from the batch request to each sub-request, and the sub-request
+# headers a client may set itself (authentication always comes from the batch request).
+INHERITED_META = ('SERVER_NAME', 'SERVER_PORT', 'HTTP_HOST', 'REMOTE_ADDR', 'HTTP_X_FORWARDED_FOR', 'HTTP_X_FORWARDED_PROTO', 'HTTP_USER_AGENT', 'HTTP_ACCEPT_LANGUAGE')
+FORWARDED_HEADERS = ('if-match', 'if-none-match', 'idempotency-key', 'accept-language')
+RETURNED_HEADERS = ('ETag', 'Location', 'Idempotent-Replayed', 'Retry-After')
+
+
+class BatchAborted(Exception):
+    pass
+
+
+# Runs the sub-requests of /api/batch/ in order against the existing views, in-process: each one
+# gets a fresh WSGIRequest with the batch request's user forced in, so there is no second
+# authentication, and its DRF Response is returned as data without being rendered.
+def resolve_view(path):
+    """The resolver match for a sub-request path, or None when it cannot be batched."""
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return None
+    view_class = getattr(match.func, 'cls', None)  # Set by APIView.as_view(); async views are plain Django views
+    if view_class is None or not issubclass(view_class, APIView) or not getattr(view_class, 'batchable', True):
+        return None
+    return match
+
+
+def run_batch(request, sub_requests, atomic=False):
+    """Return (responses, committed). With ``atomic`` the first failure rolls everything back."""
+    responses = []
+    if not atomic:
+        for sub_request in sub_requests:
+            responses.append(_run(request, sub_request))
+        return responses, True
+
+    try:
+        with transaction.atomic():
+            for sub_request in sub_requests:
+                responses.append(_run(request, sub_request))
+                if responses[-1]['status'] >= 400:
+                    raise BatchAborted()
+    except BatchAborted:
+        failed = len(responses) - 1
+        responses += [
+            {'status': 424, 'headers': {}, 'body': {'detail': f"Not run: request {failed} of the atomic batch failed."}}
+            for _ in sub_requests[len(responses):]
+        ]
+        return responses, False
+    return responses, True
+
+
+def _run(request, sub_request):
+    match = resolve_view(sub_request['path'])
+    try:
+        response = match.func(_build_request(request, sub_request), *match.args, **match.kwargs)
+    except Exception:
+        logger.exception("Batch sub-request %s %s failed", sub_request['method'], sub_request['path'])
+        return {'status': 500, 'headers': {}, 'body': {'detail': "Server error."}}
+    return {
+        'status': response.status_code,
+        'headers': {name: response[name] for name in RETURNED_HEADERS if response.has_header(name)},
+        'body': getattr(response, 'data', None),
+    }
+
+
+def _build_request(request, sub_request):
+    url = urlsplit(sub_request['path'])
+    body = sub_request.get('body')
+    content = b'' if body is None else json.dumps(body, cls=DjangoJSONEncoder).encode()
+    environ = {key: value for key, value in request.META.items() if key in INHERITED_META}
+    environ.update({
+        'REQUEST_METHOD': sub_request['method'],
+        'SCRIPT_NAME': '',
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+        'wsgi.input': io.BytesIO(content),
+        'wsgi.url_scheme': request.scheme,
+    })
+    for name, value in sub_request.get('headers', {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+    sub = WSGIRequest(environ)
+    # Picked up by rest_framework.request.Request in place of the authentication classes
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    sub.user = request.user
+    return sub
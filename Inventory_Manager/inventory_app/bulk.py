@@ -0,0 +1,91 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .models import InventoryItem, InventoryChangeLog, InventoryChangeField
+from .codes import item_code_cache
+from .counters import apply_item_changes
+
+PRICE_PERCENT = 'price_percent'
+PRICE_AMOUNT = 'price_amount'
+THRESHOLD = 'threshold'
+CATEGORY = 'category'
+OPERATIONS = [PRICE_PERCENT, PRICE_AMOUNT, THRESHOLD, CATEGORY]
+
+
+# Set-based bulk edits over a queryset of items. The selection is processed in chunks of
+# BULK_UPDATE_CHUNK_SIZE rows, each in its own short transaction: one locking read of the
+# old values, one UPDATE and one bulk_create of change-log rows.
+def bulk_update_items(queryset, operation, value, changed_by, reason='Bulk update'):
+    chunk_size = getattr(settings, 'BULK_UPDATE_CHUNK_SIZE', 500)
+    pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+    updated = 0
+    for start in range(0, len(pks), chunk_size):
+        updated += _update_chunk(pks[start:start + chunk_size], operation, value, changed_by, reason)
+    return {'updated': updated, 'skipped': len(pks) - updated}
+
+
+def _update_chunk(pks, operation, value, changed_by, reason):
+    field, expression = _get_update(operation, value)
+    with transaction.atomic():
+        rows = InventoryItem.objects.select_for_update().filter(pk__in=pks)
+        if operation == PRICE_AMOUNT and value < 0:
+            rows = rows.filter(item_price__gte=-value)  # Never take a price below zero
+        # Each row: (edited field, then the counter state: category id, quantity, price)
+        columns = [field, 'category_id', 'item_qty', 'item_price']
+        old_rows = {pk: row for pk, *row in rows.values_list('pk', *columns)}
+        if not old_rows:
+            return 0
+
+        InventoryItem.objects.filter(pk__in=old_rows).update(**{
+            field: expression,
+            'version': F('version') + 1,
+            'last_updated': timezone.now(),
+        })
+        item_code_cache.forget_items(old_rows)
+        new_rows = {pk: row for pk, *row in InventoryItem.objects.filter(pk__in=old_rows).values_list('pk', *columns)}
+        apply_item_changes((tuple(old_rows[pk][1:]), tuple(row[1:])) for pk, row in new_rows.items())
+        old_values = {pk: row[0] for pk, row in old_rows.items()}
+        new_values = {pk: row[0] for pk, row in new_rows.items()}
+
+        logs = []
+        for pk, old_value in old_values.items():
+            new_value = new_values[pk]
+            if new_value == old_value:
+                continue
+            logs.append(InventoryChangeLog(
+                inventory_item_id=pk,
+                # The log requires a quantity or price; non-price edits record a zero quantity change
+                change_quantity=None if field == 'item_price' else 0,
+                change_price=new_value - old_value if field == 'item_price' else None,
+                reason=reason,
+                changed_by=changed_by,
+                change_details={field.removesuffix('_id'): {'old': old_value, 'new': new_value}},
+            ))
+        logs = InventoryChangeLog.objects.bulk_create(logs)
+        if logs and logs[0].pk is None:
+            # MySQL cannot return ids from a bulk insert. Each item got exactly one log in this
+            # chunk and its row is still locked, so the item's newest log is the one just written.
+            latest = InventoryChangeLog.objects.filter(inventory_item_id__in=old_values).values('inventory_item_id').annotate(latest_id=Max('id'))
+            latest_ids = {row['inventory_item_id']: row['latest_id'] for row in latest}
+            for log in logs:
+                log.pk = latest_ids[log.inventory_item_id]
+        InventoryChangeField.objects.bulk_create([row for log in logs for row in InventoryChangeField.from_log(log)])
+    return len(old_values)
+
+
+def _get_update(operation, value):
+    if operation == PRICE_PERCENT:
+        factor = Decimal(1) + Decimal(value) / Decimal(100)
+        return 'item_price', Round(F('item_price') * Value(factor), 2)
+    if operation == PRICE_AMOUNT:
+        return 'item_price', F('item_price') + Value(Decimal(value))
+    if operation == THRESHOLD:
+        return 'low_stock_threshold', int(value)
+    if operation == CATEGORY:
+        return 'category_id', value.pk if value is not None else None
+    raise ValueError(f"Unknown bulk operation: {operation}")
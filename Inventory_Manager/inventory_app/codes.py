@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+
+# In-process LRU cache for SKU/barcode lookups (/api/inventory/by-code/), so a till scanning
+# the same codes over and over is answered without a query or re-serializing the item.
+# Entries are keyed by (requesting user, owner, code) and hold the serialized item. Writes in
+# this process drop the entries of the items they touch once they commit; writes in other
+# processes are picked up when the entry expires after ITEM_CODE_CACHE_TTL seconds.
+class ItemCodeCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires, item id, data)
+        self._keys_by_item = {}  # item id -> keys cached for it
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, item_id, data):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, item_id, data)
+            self._keys_by_item.setdefault(item_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))  # Least recently used
+
+    def forget_items(self, item_ids):
+        """Drop every entry for these items, once the current transaction commits."""
+        item_ids = list(item_ids)
+        transaction.on_commit(lambda: self._forget(item_ids))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_item.clear()
+
+    def _forget(self, item_ids):
+        with self._lock:
+            for item_id in item_ids:
+                for key in list(self._keys_by_item.get(item_id, ())):
+                    self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_item.get(entry[1])
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_item[entry[1]]
+
+
+item_code_cache = ItemCodeCache(settings.ITEM_CODE_CACHE_SIZE, settings.ITEM_CODE_CACHE_TTL)
+
+
+def normalize_code(code):
+    """Scanners pad codes with whitespace; an empty code means no code."""
+    code = (code or '').strip()
+    return code or None
@@ -0,0 +1,69 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Category, InventoryItem
+
+
+# Category.item_count, total_quantity and total_value are maintained from every write path:
+# model save/delete signals (models.py), the conditional UPDATE in the item serializer and
+# bulk.py. Each passes (old state, new state) pairs here, inside the transaction that
+# changes the items; reconcile_category_counters() repairs any drift.
+
+def get_counter_state(item):
+    """(category id, quantity, price) of an item, as the counters see it; None once soft-deleted."""
+    if item.deleted_at is not None:
+        return None
+    return item.category_id, item.item_qty, item.item_price
+
+
+def apply_item_changes(changes):
+    """Apply (old state, new state) pairs to the category counters; either side may be None."""
+    deltas = defaultdict(lambda: [0, 0, Decimal(0)])
+    for old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None or state[0] is None:
+                continue
+            category_id, quantity, price = state
+            delta = deltas[category_id]
+            delta[0] += sign
+            delta[1] += sign * quantity
+            delta[2] += sign * quantity * price
+    # Fixed lock order, so two transactions touching the same categories cannot deadlock
+    for category_id in sorted(deltas):
+        items, quantity, value = deltas[category_id]
+        if items or quantity or value:
+            Category.objects.filter(pk=category_id).update(
+                item_count=F('item_count') + items,
+                total_quantity=F('total_quantity') + quantity,
+                total_value=F('total_value') + value,
+            )
+
+
+def get_category_totals(items):
+    return items.aggregate(
+        item_count=Count('id'),
+        total_quantity=Coalesce(Sum('item_qty'), 0),
+        total_value=Coalesce(Sum(F('item_qty') * F('item_price')), Decimal(0)),
+    )
+
+
+def reconcile_category_counters(categories=None):
+    """Recompute the counters from the items and return the categories that had drifted."""
+    categories = Category.objects.all() if categories is None else categories
+    fixed = []
+    for category_id in categories.order_by('pk').values_list('pk', flat=True):
+        # Locking the category first makes writers that have not committed yet apply their
+        # delta after this recount, so nothing is counted twice or lost.
+        with transaction.atomic():
+            category = Category.objects.select_for_update().filter(pk=category_id).first()
+            if category is None:
+                continue
+            totals = get_category_totals(InventoryItem.objects.filter(category_id=category_id))
+            if any(getattr(category, name) != value for name, value in totals.items()):
+                Category.objects.filter(pk=category_id).update(**totals)
+                fixed.append((category, totals))
+    return fixed
@@ -0,0 +1,120 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .autocomplete import autocomplete_index
+from .codes import item_code_cache
+from .counters import apply_item_changes
+from .models import IdempotencyKey, InventoryChangeLog, InventoryItem, InventoryItemTombstone
+
+User = get_user_model()
+
+
+# Deleting an item or a user used to cascade through every change log inside the request.
+# Now it only marks the rows: soft_delete_items() hides items at once (they leave the
+# category counters and get a sync tombstone), soft_delete_user() also deactivates the
+# account. `manage.py purge_deleted` later removes the rows and everything that depends on
+# them in chunks of PURGE_CHUNK_SIZE, each chunk in its own short transaction.
+def soft_delete_items(queryset, tombstones=True):
+    """Soft-delete the items in ``queryset`` in chunks and return how many were deleted."""
+    chunk_size = settings.PURGE_CHUNK_SIZE
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                queryset.filter(deleted_at__isnull=True).select_for_update().order_by('pk')
+                .values_list('pk', 'owner_id', 'category_id', 'item_qty', 'item_price')[:chunk_size]
+            )
+            if not rows:
+                return deleted
+            now = timezone.now()
+            InventoryItem.all_objects.filter(pk__in=[row[0] for row in rows]).update(
+                deleted_at=now, last_updated=now, version=F('version') + 1, sku=None,
+            )
+            item_code_cache.forget_items(row[0] for row in rows)
+            autocomplete_index.items_deleted((row[1], row[0]) for row in rows)
+            apply_item_changes((tuple(row[2:]), None) for row in rows)
+            # Logged for the change feed. Bulk-created, so without the per-field index rows
+            InventoryChangeLog.objects.bulk_create([
+                InventoryChangeLog(
+                    inventory_item_id=pk, change_quantity=0, reason='Item deleted', changed_by_id=owner_id,
+                    change_details={'deleted_at': {'old': None, 'new': now}},
+                )
+                for pk, owner_id, *_ in rows
+            ])
+            if tombstones:
+                InventoryItemTombstone.objects.bulk_create([
+                    InventoryItemTombstone(item_id=pk, owner_id=owner_id, deleted_at=now) for pk, owner_id, *_ in rows
+                ])
+        deleted += len(rows)
+
+
+def soft_delete_user(user):
+    """Deactivate the account and soft-delete the user's items."""
+    User.objects.filter(pk=user.pk).update(is_active=False, deleted_at=timezone.now())
+    # Deleting the owner removes their whole sync scope, so no tombstones
+    return soft_delete_items(InventoryItem.objects.filter(owner_id=user.pk), tombstones=False)
+
+
+def purge_deleted(progress=None, chunk_size=None, pause=None):
+    """Remove soft-deleted items, then soft-deleted users, with their dependent rows.
+
+    ``progress(message)`` is called after every chunk. Returns the number of rows deleted per model.
+    """
+    purge = Purge(progress, chunk_size or settings.PURGE_CHUNK_SIZE, settings.PURGE_CHUNK_PAUSE_SECONDS if pause is None else pause)
+    for item_id in purge.ids(InventoryItem.all_objects.filter(deleted_at__isnull=False)):
+        purge.item(item_id)
+    for user_id in purge.ids(User.objects.filter(deleted_at__isnull=False)):
+        purge.user(user_id)
+    return purge.totals
+
+
+class Purge:
+    def __init__(self, progress, chunk_size, pause):
+        self.progress = progress or (lambda message: None)
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.totals = {}
+
+    def ids(self, queryset):
+        # Keyset batches, so rows deleted along the way do not disturb the scan
+        last_pk = 0
+        while True:
+            pks = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:self.chunk_size])
+            if not pks:
+                return
+            yield from pks
+            last_pk = pks[-1]
+
+    def delete_chunks(self, label, queryset):
+        """Delete ``queryset`` by primary key, one chunk per transaction, so locks are held briefly."""
+        name = queryset.model._meta.verbose_name_plural.lower()
+        while True:
+            pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:self.chunk_size])
+            if not pks:
+                return
+            with transaction.atomic():
+                _, counts = queryset.model._base_manager.filter(pk__in=pks).delete()
+            for model_label, count in counts.items():
+                self.totals[model_label] = self.totals.get(model_label, 0) + count
+            self.progress(f"{label}: deleted {len(pks)} {name}")
+            if self.pause:
+                time.sleep(self.pause)
+
+    def item(self, item_id):
+        label = f"item {item_id}"
+        self.delete_chunks(label, InventoryChangeLog.objects.filter(inventory_item_id=item_id))  # Their field rows go with them
+        self.delete_chunks(label, InventoryItem.all_objects.filter(pk=item_id))  # With its forecast
+
+    def user(self, user_id):
+        label = f"user {user_id}"
+        for item_id in self.ids(InventoryItem.all_objects.filter(owner_id=user_id)):
+            self.item(item_id)
+        self.delete_chunks(label, InventoryChangeLog.objects.filter(changed_by_id=user_id))  # Logs written on other users' items
+        self.delete_chunks(label, InventoryItemTombstone.objects.filter(owner_id=user_id))
+        self.delete_chunks(label, IdempotencyKey.objects.filter(scope=f"user:{user_id}"))
+        self.delete_chunks(label, User.objects.filter(pk=user_id))
@@ -0,0 +1,32 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+# Raised when an If-Match version no longer matches the stored row.
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The item was modified by another request. Reload it and try again.'
+    default_code = 'precondition_failed'
+
+# Raised when a request reuses an Idempotency-Key whose first request is still running.
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still being processed.'
+    default_code = 'idempotency_conflict'
+
+# Raised when an Idempotency-Key is reused for a different request.
+class IdempotencyKeyMismatch(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used for a different request.'
+    default_code = 'idempotency_key_mismatch'
+
+# Raised when a sync cursor is older than the tombstone retention window.
+class SyncCursorExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'The sync cursor has expired. Sync again without "since" to reload all items.'
+    default_code = 'sync_cursor_expired'
+
+# Raised when cancelling a job that a worker has already started or finished.
+class JobNotCancellable(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Only queued jobs can be cancelled.'
+    default_code = 'job_not_cancellable'
@@ -0,0 +1,136 @@
+import asyncio
+import contextvars
+import logging
+import time
+
+from django.conf import settings
+
+from .models import InventoryChangeLog
+
+logger = logging.getLogger(__name__)
+
+FEED_FIELDS = [
+    'id', 'inventory_item_id', 'inventory_item__owner_id', 'inventory_item__item_name',
+    'inventory_item__item_qty', 'inventory_item__item_price', 'inventory_item__low_stock_threshold',
+    'change_quantity', 'change_price', 'change_details', 'date_changed',
+]
+
+
+def get_events(row):
+    """Turn a change-log row (FEED_FIELDS) into feed events: the creation, change or deletion of
+    an item and any low-stock transition.
+    """
+    details = row['change_details'] or {}
+    item = {
+        'id': row['inventory_item_id'],
+        'item_name': row['inventory_item__item_name'],
+        'item_qty': row['inventory_item__item_qty'],
+        'item_price': str(row['inventory_item__item_price']),
+        'low_stock_threshold': row['inventory_item__low_stock_threshold'],
+    }
+    # The item as this change left it; fields the log does not cover show their current value
+    for field in ['item_name', 'item_qty', 'item_price', 'low_stock_threshold']:
+        if isinstance(details.get(field), dict) and 'new' in details[field]:
+            item[field] = details[field]['new']
+    if 'deleted_at' in details:
+        return [('item_deleted', {'item': item, 'date_changed': row['date_changed']})]
+    # Creation logs record every field as changed from nothing; an existing item always has a name
+    created = isinstance(details.get('item_name'), dict) and details['item_name'].get('old', '') is None
+    events = [('item_created' if created else 'item_changed', {
+        'item': item,
+        'change_quantity': row['change_quantity'],
+        'change_price': None if row['change_price'] is None else str(row['change_price']),
+        'change_details': details,
+        'date_changed': row['date_changed'],
+    })]
+
+    qty = details.get('item_qty', {})
+    threshold = details.get('low_stock_threshold', {})
+    was_low = not created and qty.get('old', item['item_qty']) < threshold.get('old', item['low_stock_threshold'])
+    is_low = item['item_qty'] < item['low_stock_threshold']
+    if was_low != is_low:
+        events.append(('low_stock', {'item': item, 'low_stock': is_low}))
+    return events
+
+
+class Subscriber:
+    def __init__(self, owner_id):
+        self.owner_id = owner_id  # None receives every owner's changes (staff)
+        self.queue = asyncio.Queue(maxsize=getattr(settings, 'CHANGE_FEED_QUEUE_SIZE', 1000))
+        self.overflowed = False
+
+
+# One poller per process fans change-log rows out to every connected client, so the
+# database sees one query per CHANGE_FEED_POLL_SECONDS however many streams are open.
+# It only runs while someone is subscribed.
+class ChangeFeed:
+
+    def __init__(self):
+        self.subscribers = set()
+        self.cursor = None
+        self.gaps = {}  # Skipped ids (transactions not yet committed) -> when to give up on them
+        self.task = None
+        self.ready = None  # Set once the cursor is known; events after that reach subscribers live
+
+    def subscribe(self, owner_id):
+        subscriber = Subscriber(owner_id)
+        self.subscribers.add(subscriber)
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.ready = asyncio.Event()
+            # A fresh context, so the poller does not inherit the request's replica routing
+            self.task = loop.create_task(self.run(), context=contextvars.Context())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    async def run(self):
+        interval = getattr(settings, 'CHANGE_FEED_POLL_SECONDS', 1)
+        if self.cursor is None:
+            latest = await InventoryChangeLog.objects.order_by('-id').values_list('id', flat=True).afirst()
+            self.cursor = latest or 0
+        self.ready.set()
+        while self.subscribers:
+            try:
+                await self.poll()
+            except Exception:
+                # Keep streams open through a transient database error; the next poll retries.
+                logger.exception("Change feed poll failed")
+            await asyncio.sleep(interval)
+        # Idle: the next subscriber starts again from the newest log
+        self.cursor = None
+        self.gaps = {}
+
+    async def poll(self):
+        batch_size = getattr(settings, 'CHANGE_FEED_BATCH_SIZE', 500)
+        now = time.monotonic()
+        self.gaps = {pk: expires for pk, expires in self.gaps.items() if expires > now}
+        queryset = InventoryChangeLog.objects.filter(id__gt=self.cursor)
+        if self.gaps:
+            queryset = queryset | InventoryChangeLog.objects.filter(id__in=list(self.gaps))
+        rows = [row async for row in queryset.order_by('id').values(*FEED_FIELDS)[:batch_size]]
+        for row in rows:
+            self.gaps.pop(row['id'], None)
+            if row['id'] > self.cursor:
+                # Ids are allocated before commit, so a lower one may still show up shortly
+                if row['id'] - self.cursor <= batch_size:
+                    gap_timeout = now + getattr(settings, 'CHANGE_FEED_GAP_SECONDS', 10)
+                    self.gaps.update((pk, gap_timeout) for pk in range(self.cursor + 1, row['id']))
+                self.cursor = row['id']
+            self.publish(row)
+
+    def publish(self, row):
+        events = None
+        for subscriber in list(self.subscribers):
+            if subscriber.overflowed or subscriber.owner_id not in (None, row['inventory_item__owner_id']):
+                continue
+            events = events or get_events(row)
+            try:
+                subscriber.queue.put_nowait((row['id'], events))
+            except asyncio.QueueFull:
+                # Too slow to keep up; its stream is closed and the client resumes from its last id.
+                subscriber.overflowed = True
+
+
+change_feed = ChangeFeed()
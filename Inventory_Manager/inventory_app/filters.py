@@ -0,0 +1,82 @@
+from decimal import Decimal
+
+import django_filters
+from django.db.models import Exists, F, OuterRef
+
+from .models import InventoryItem, InventoryChangeLog, InventoryChangeField, InventoryForecast
+
+
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    pass
+
+
+# Item browsing filters: ?category=1,4&min_price=10&max_price=50&min_qty=1&added_after=2024-01-01T00:00:00Z&low_stock=true
+class InventoryItemFilter(django_filters.FilterSet):
+    category = NumberInFilter(field_name='category', lookup_expr='in')
+    min_price = django_filters.NumberFilter(field_name='item_price', lookup_expr='gte')
+    max_price = django_filters.NumberFilter(field_name='item_price', lookup_expr='lte')
+    min_qty = django_filters.NumberFilter(field_name='item_qty', lookup_expr='gte')
+    max_qty = django_filters.NumberFilter(field_name='item_qty', lookup_expr='lte')
+    added_after = django_filters.IsoDateTimeFilter(field_name='date_added', lookup_expr='gte')
+    added_before = django_filters.IsoDateTimeFilter(field_name='date_added', lookup_expr='lt')
+    low_stock = django_filters.BooleanFilter(method='filter_low_stock')
+
+    class Meta:
+        model = InventoryItem
+        fields = ['item_price']
+
+    def filter_low_stock(self, queryset, name, value):
+        # Items below their own low stock threshold (or at/above it for low_stock=false)
+        if value:
+            return queryset.filter(item_qty__lt=F('low_stock_threshold'))
+        return queryset.filter(item_qty__gte=F('low_stock_threshold'))
+
+
+# Forecast filters: ?stockout_within=14&category=1,4&needs_reorder=true
+class InventoryForecastFilter(django_filters.FilterSet):
+    category = NumberInFilter(field_name='item__category', lookup_expr='in')
+    stockout_within = django_filters.NumberFilter(field_name='days_until_stockout', lookup_expr='lte')
+    needs_reorder = django_filters.BooleanFilter(method='filter_needs_reorder')
+
+    class Meta:
+        model = InventoryForecast
+        fields = ['item']
+
+    def filter_needs_reorder(self, queryset, name, value):
+        # Items whose stock is at or below the suggested threshold
+        if value:
+            return queryset.filter(item__item_qty__lte=F('suggested_threshold'))
+        return queryset.filter(item__item_qty__gt=F('suggested_threshold'))
+
+
+def _ignore(queryset, name, value):
+    # Applied together in InventoryChangeLogFilter.filter_queryset
+    return queryset
+
+
+# Change-log filters. "field", "min_change_pct" and "max_change_pct" all match against the
+# same InventoryChangeField row, e.g. ?field=item_price&min_change_pct=20 finds price rises of 20% or more.
+class InventoryChangeLogFilter(django_filters.FilterSet):
+    changed_after = django_filters.IsoDateTimeFilter(field_name='date_changed', lookup_expr='gte')
+    changed_before = django_filters.IsoDateTimeFilter(field_name='date_changed', lookup_expr='lt')
+    field = django_filters.CharFilter(method=_ignore)
+    min_change_pct = django_filters.NumberFilter(method=_ignore)
+    max_change_pct = django_filters.NumberFilter(method=_ignore)
+
+    class Meta:
+        model = InventoryChangeLog
+        fields = ['inventory_item', 'changed_by']
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        field_filters = {}
+        if self.form.cleaned_data.get('field'):
+            field_filters['field_name'] = self.form.cleaned_data['field']
+        if self.form.cleaned_data.get('min_change_pct') is not None:
+            field_filters['change_ratio__gte'] = self.form.cleaned_data['min_change_pct'] / Decimal(100)
+        if self.form.cleaned_data.get('max_change_pct') is not None:
+            field_filters['change_ratio__lte'] = self.form.cleaned_data['max_change_pct'] / Decimal(100)
+        if field_filters:
+            changes = InventoryChangeField.objects.filter(change_log=OuterRef('pk'), **field_filters)
+            queryset = queryset.filter(Exists(changes))
+        return queryset
@@ -0,0 +1,107 @@
+import math
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import InventoryItem, InventoryChangeLog, InventoryForecast
+
+FORECAST_FIELDS = ['daily_consumption', 'consumption_std', 'days_until_stockout', 'suggested_threshold', 'window_days', 'computed_at']
+
+
+# Reorder points from consumption history. Items are processed in chunks by primary key: one
+# query sums each item's negative quantity changes per day over the window, NumPy places those
+# rows in an items x days matrix and derives every figure for the whole chunk at once:
+#   daily consumption    moving average of the daily totals over the window (or over the days
+#                        since the item was added, if that is shorter)
+#   days until stockout  current quantity / daily consumption
+#   suggested threshold  consumption over the lead time plus service_z standard deviations of
+#                        safety stock, i.e. the stock at which a reorder still arrives in time
+def compute_forecasts(window_days=None, lead_time_days=None, service_z=None, chunk_size=None, progress=None):
+    """Recompute the forecast of every item and return the number of items processed.
+
+    ``progress(message)`` is called after every chunk.
+    """
+    import numpy as np  # Only this batch job needs NumPy
+
+    window_days = window_days or settings.FORECAST_WINDOW_DAYS
+    lead_time_days = lead_time_days or settings.FORECAST_LEAD_TIME_DAYS
+    service_z = settings.FORECAST_SERVICE_Z if service_z is None else service_z
+    chunk_size = chunk_size or settings.FORECAST_CHUNK_SIZE
+
+    computed_at = timezone.now()
+    today = timezone.localdate(computed_at)
+    first_day = today - timedelta(days=window_days - 1)
+    window_start = timezone.make_aware(datetime.combine(first_day, time.min))
+    columns = np.arange(window_days)
+
+    processed, last_pk = 0, 0
+    while True:
+        items = list(
+            InventoryItem.objects.filter(pk__gt=last_pk).order_by('pk')
+            .annotate(added=TruncDate('date_added')).values_list('pk', 'item_qty', 'added')[:chunk_size]
+        )
+        if not items:
+            return processed
+        last_pk = items[-1][0]
+        pks = np.fromiter((row[0] for row in items), dtype=np.int64, count=len(items))
+        quantities = np.fromiter((row[1] for row in items), dtype=np.float64, count=len(items))
+        added = np.array([row[2] for row in items], dtype='datetime64[D]')
+
+        daily = list(
+            InventoryChangeLog.objects
+            .filter(inventory_item_id__gte=items[0][0], inventory_item_id__lte=last_pk, change_quantity__lt=0, date_changed__gte=window_start)
+            .annotate(day=TruncDate('date_changed')).values_list('inventory_item_id', 'day')
+            .annotate(consumed=Sum('change_quantity')).order_by()
+        )
+        consumption = np.zeros((len(items), window_days))
+        if daily:
+            item_ids = np.fromiter((row[0] for row in daily), dtype=np.int64, count=len(daily))
+            days = (np.array([row[1] for row in daily], dtype='datetime64[D]') - np.datetime64(first_day)).astype(np.int64)
+            consumed = -np.fromiter((row[2] for row in daily), dtype=np.float64, count=len(daily))
+            rows = np.minimum(np.searchsorted(pks, item_ids), len(pks) - 1)
+            known = (pks[rows] == item_ids) & (days >= 0) & (days < window_days)  # Skips items created after the chunk was read
+            np.add.at(consumption, (rows[known], days[known]), consumed[known])
+
+        # Only the days since an item was added count towards its averages
+        observed = np.clip((np.datetime64(today) - added).astype(np.int64) + 1, 1, window_days)
+        in_window = columns[None, :] >= (window_days - observed)[:, None]
+        mean = (consumption * in_window).sum(axis=1) / observed
+        std = np.sqrt((((consumption - mean[:, None]) ** 2) * in_window).sum(axis=1) / observed)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            days_left = np.where(mean > 0, quantities / mean, np.nan)
+        suggested = np.ceil(mean * lead_time_days + service_z * std * math.sqrt(lead_time_days))
+
+        forecasts = [
+            InventoryForecast(
+                item_id=int(pk),
+                daily_consumption=Decimal(f'{mean[i]:.4f}'),
+                consumption_std=Decimal(f'{std[i]:.4f}'),
+                days_until_stockout=None if np.isnan(days_left[i]) else Decimal(f'{min(days_left[i], 999999999):.1f}'),
+                suggested_threshold=int(suggested[i]),
+                window_days=window_days,
+                computed_at=computed_at,
+            )
+            for i, pk in enumerate(pks)
+        ]
+        try:
+            _save_forecasts(forecasts)
+        except IntegrityError:
+            # An item was deleted since the chunk was read; write the others
+            existing = set(InventoryItem.objects.filter(pk__in=[int(pk) for pk in pks]).values_list('pk', flat=True))
+            _save_forecasts([forecast for forecast in forecasts if forecast.item_id in existing])
+        processed += len(forecasts)
+        if progress:
+            progress(f"{processed} items forecast")
+
+
+def _save_forecasts(forecasts):
+    # An upsert on the item key. MySQL's ON DUPLICATE KEY UPDATE takes no conflict target (it uses
+    # the primary key, which is the item), and Django refuses unique_fields there.
+    unique_fields = ['item'] if connection.features.supports_update_conflicts_with_target else None
+    with transaction.atomic():
+        InventoryForecast.objects.bulk_create(forecasts, update_conflicts=True, unique_fields=unique_fields, update_fields=FORECAST_FIELDS)
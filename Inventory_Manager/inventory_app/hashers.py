@@ -0,0 +1,10 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+# PBKDF2 with its work factor taken from PASSWORD_HASH_ITERATIONS. It keeps Django's algorithm
+# name, so existing hashes still verify and are re-hashed at the configured cost on next login.
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
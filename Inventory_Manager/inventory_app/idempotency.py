@@ -0,0 +1,104 @@
+import hashlib
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .exceptions import IdempotencyConflict, IdempotencyKeyMismatch
+from .models import IdempotencyKey
+
+IDEMPOTENT_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class IdempotentReplay(Exception):
+    def __init__(self, record):
+        self.record = record
+
+
+def get_scope(request):
+    return f"user:{request.user.pk}"
+
+
+def get_fingerprint(request):
+    digest = hashlib.sha256(f"{request.method} {request.get_full_path()}".encode())
+    if request.content_type.startswith('multipart/'):
+        # Uploads can be large; the size stands in for the body.
+        digest.update(request.META.get('CONTENT_LENGTH', '').encode())
+    else:
+        digest.update(request._request.body)
+    return digest.hexdigest()
+
+
+def claim_key(request, key):
+    """Reserve ``key`` for this request, or raise if it has been seen before.
+
+    The common path is a single insert against the unique (scope, key) index;
+    a repeat costs one extra indexed lookup.
+    """
+    scope = get_scope(request)
+    fingerprint = get_fingerprint(request)
+    now = timezone.now()
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    scope=scope, key=key, request_fingerprint=fingerprint,
+                    expires_at=now + settings.IDEMPOTENCY_KEY_TTL,
+                )
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+        if existing is None:
+            continue  # Expired and purged in the meantime
+        abandoned = existing.response_status is None and existing.created_at <= now - settings.IDEMPOTENCY_LOCK_TIMEOUT
+        if existing.expires_at <= now or abandoned:
+            existing.delete()
+            continue
+        if existing.request_fingerprint != fingerprint:
+            raise IdempotencyKeyMismatch()
+        if existing.response_status is None:
+            raise IdempotencyConflict()
+        raise IdempotentReplay(existing)
+    raise IdempotencyConflict()
+
+
+# Makes write requests carrying an "Idempotency-Key" header safe to retry: the first
+# successful response is stored and replayed for repeats of the same request. Anonymous
+# requests (registration) ignore the header: they share no scope that would keep one
+# client from replaying another's response.
+class IdempotentMixin:
+
+    def dispatch(self, request, *args, **kwargs):
+        self._idempotency_record = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._idempotency_record is not None:
+                # The view crashed before a response was built; let the client retry.
+                self._idempotency_record.delete()
+                self._idempotency_record = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        key = request.headers.get('Idempotency-Key')
+        if key and request.method in IDEMPOTENT_METHODS and request.user and request.user.is_authenticated:
+            self._idempotency_record = claim_key(request, key[:255])
+
+    def handle_exception(self, exc):
+        if isinstance(exc, IdempotentReplay):
+            return Response(exc.record.response_body, status=exc.record.response_status, headers={'Idempotent-Replayed': 'true'})
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        record = self._idempotency_record
+        if record is not None:
+            self._idempotency_record = None
+            if 200 <= response.status_code < 300:
+                record.response_status = response.status_code
+                record.response_body = response.data
+                record.save(update_fields=['response_status', 'response_body'])
+            else:
+                # Only successful outcomes are kept; failed requests may be retried as-is.
+                record.delete()
+        return response
@@ -0,0 +1,271 @@
+import inspect
+import logging
+import multiprocessing
+import os
+import secrets
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import counters, deletion, forecasting
+from .models import InventoryItem, Job
+
+logger = logging.getLogger(__name__)
+
+# Least time between two progress writes of a job; the last report before it finishes may be dropped
+PROGRESS_MIN_INTERVAL = 1.0
+
+# Background jobs without a broker: a job is a row of the Job table and `manage.py run_jobs`
+# workers claim ready rows, run them in a process or thread pool and record the outcome.
+#
+#   enqueue()      adds a job for a task registered in TASKS
+#   claim_jobs()   marks up to n ready jobs as running for one worker. Where the database has
+#                  SELECT ... FOR UPDATE SKIP LOCKED (MySQL 8, PostgreSQL) concurrent workers
+#                  lock disjoint rows; elsewhere (SQLite) a conditional UPDATE settles races.
+#   run_job()      runs one claimed attempt. A failure is retried after JOB_RETRY_BACKOFF_SECONDS,
+#                  doubling per attempt up to JOB_RETRY_BACKOFF_MAX_SECONDS, until max_attempts.
+#   run_worker()   the worker loop. It refreshes heartbeat_at of its running jobs every poll, so
+#                  a job whose worker died is claimed again after JOB_STALE_SECONDS.
+#
+# Every write for an attempt is filtered on the worker and attempt number that claimed it, so
+# a worker presumed dead cannot overwrite the outcome of the attempt that replaced it.
+TASKS = {}
+
+# Tasks whose arguments hold secrets (passwords). Their arguments are hidden from the API and the
+# admin and cleared once the job is over: succeeded, failed for good or cancelled.
+PRIVATE_ARGS_TASKS = set()
+
+
+def task(func=None, private_args=False):
+    """Register ``func(progress, **args)`` as a job task under its name."""
+    if func is None:
+        return lambda func: task(func, private_args)
+    TASKS[func.__name__] = func
+    if private_args:
+        PRIVATE_ARGS_TASKS.add(func.__name__)
+    return func
+
+
+def _clear_private_args(jobs):
+    jobs.filter(task__in=PRIVATE_ARGS_TASKS).update(args={})
+
+
+def check_task_args(name, args):
+    """Raise ValueError unless ``args`` are valid keyword arguments for the task."""
+    if name not in TASKS:
+        raise ValueError(f"Unknown task {name!r}.")
+    try:
+        inspect.signature(TASKS[name]).bind(None, **args)
+    except TypeError as error:
+        raise ValueError(str(error))
+
+
+def enqueue(name, args=None, created_by=None, run_after=None, max_attempts=None):
+    args = args or {}
+    check_task_args(name, args)
+    return Job.objects.create(
+        task=name,
+        args=args,
+        created_by=created_by,
+        run_after=run_after or timezone.now(),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def _ready(now):
+    stale = now - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    return Q(status=Job.QUEUED, run_after__lte=now) | Q(status=Job.RUNNING, heartbeat_at__lt=stale)
+
+
+def claim_jobs(worker, limit):
+    """Mark up to ``limit`` ready jobs as running for ``worker``; returns (job id, attempt) pairs."""
+    now = timezone.now()
+    claimed = []
+    with transaction.atomic():
+        # Jobs abandoned by a dead worker on their last attempt are not run again
+        abandoned = Job.objects.filter(_ready(now), status=Job.RUNNING, attempts__gte=F('max_attempts'))
+        _clear_private_args(abandoned)
+        abandoned.update(status=Job.FAILED, finished_at=now, error='The worker running the last attempt stopped responding.')
+        candidates = Job.objects.filter(_ready(now)).order_by('run_after', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        for pk, attempts in candidates.values_list('pk', 'attempts')[:limit]:
+            # Without SKIP LOCKED another worker may have claimed the row since it was read
+            if Job.objects.filter(_ready(now), pk=pk, attempts=attempts).update(
+                status=Job.RUNNING, attempts=attempts + 1, worker=worker, started_at=now, heartbeat_at=now,
+                progress=None, progress_message='',
+            ):
+                claimed.append((pk, attempts + 1))
+    return claimed
+
+
+def _attempt(job_id, worker, attempt):
+    return Job.objects.filter(pk=job_id, status=Job.RUNNING, worker=worker, attempts=attempt)
+
+
+class JobProgress:
+    """The ``progress(message, percent=None)`` callback passed to a task."""
+
+    def __init__(self, job_id, worker, attempt):
+        self.job_id = job_id
+        self.worker = worker
+        self.attempt = attempt
+        self.last_write = 0.0
+
+    def __call__(self, message, percent=None):
+        now = time.monotonic()
+        if now - self.last_write < PROGRESS_MIN_INTERVAL:
+            return
+        self.last_write = now
+        values = {'progress_message': str(message)[:255]}
+        if percent is not None:
+            values['progress'] = max(0, min(100, int(percent)))
+        _attempt(self.job_id, self.worker, self.attempt).update(**values)
+
+
+def run_job(job_id, worker, attempt):
+    """Run one claimed attempt of a job and record its result, or schedule the retry."""
+    try:
+        job = _attempt(job_id, worker, attempt).first()
+        if job is None:
+            return  # Claimed again meanwhile
+        try:
+            func = TASKS.get(job.task)
+            if func is None:
+                raise LookupError(f"Unknown task {job.task!r}.")
+            result = func(JobProgress(job_id, worker, attempt), **job.args)
+        except Exception:
+            logger.exception("Job %s (%s) failed on attempt %s", job_id, job.task, attempt)
+            _record_failure(job, worker, attempt, traceback.format_exc())
+        else:
+            _clear_private_args(_attempt(job_id, worker, attempt))
+            _attempt(job_id, worker, attempt).update(
+                status=Job.SUCCEEDED, result=result, error='', progress=100, finished_at=timezone.now(),
+            )
+    finally:
+        connections.close_all()  # Pool threads and processes outlive the job
+
+
+def _record_failure(job, worker, attempt, error):
+    now = timezone.now()
+    if attempt >= job.max_attempts:
+        _clear_private_args(_attempt(job.pk, worker, attempt))
+        _attempt(job.pk, worker, attempt).update(status=Job.FAILED, error=error, finished_at=now)
+        return
+    backoff = min(settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1), settings.JOB_RETRY_BACKOFF_MAX_SECONDS)
+    _attempt(job.pk, worker, attempt).update(
+        status=Job.QUEUED, error=error, run_after=now + timedelta(seconds=backoff), heartbeat_at=None,
+    )
+
+
+def cancel_job(job_id):
+    """Cancel a job that has not started yet; returns whether it was cancelled."""
+    cancelled = bool(Job.objects.filter(pk=job_id, status=Job.QUEUED).update(status=Job.CANCELLED, finished_at=timezone.now()))
+    if cancelled:
+        _clear_private_args(Job.objects.filter(pk=job_id))
+    return cancelled
+
+
+def _make_pool(pool, workers):
+    if pool == 'thread':
+        return ThreadPoolExecutor(workers, thread_name_prefix='job')
+    # Spawned rather than forked, so no open database connection is shared with the children
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup)
+
+
+def run_worker(workers=None, pool=None, poll_seconds=None, burst=False, stop=None, log=None):
+    """Claim and run jobs until ``stop`` (a threading.Event) is set, or the queue is empty with ``burst``.
+
+    Jobs already running when ``stop`` is set are finished first.
+    """
+    workers = workers or settings.JOB_WORKERS
+    poll_seconds = settings.JOB_POLL_SECONDS if poll_seconds is None else poll_seconds
+    stop = stop or threading.Event()
+    log = log or (lambda message: None)
+    name = f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"
+    running = {}  # future -> job id
+
+    with _make_pool(pool or settings.JOB_POOL, workers) as executor:
+        log(f"Worker {name} started with {workers} {pool or settings.JOB_POOL} workers.")
+        while True:
+            claimed = []
+            if not stop.is_set() and len(running) < workers:
+                claimed = claim_jobs(name, workers - len(running))
+                for job_id, attempt in claimed:
+                    log(f"Job {job_id}: attempt {attempt} started.")
+                    running[executor.submit(run_job, job_id, name, attempt)] = job_id
+            if not running:
+                if stop.is_set() or (burst and not claimed):
+                    return
+                stop.wait(poll_seconds)
+                continue
+
+            done, _ = wait(running, timeout=poll_seconds, return_when=FIRST_COMPLETED)
+            for future in done:
+                job_id = running.pop(future)
+                try:
+                    future.result()
+                except BrokenProcessPool:
+                    raise  # A pool process died; its jobs are picked up again once stale
+                except Exception:
+                    logger.exception("Job %s could not be run", job_id)
+                log(f"Job {job_id}: finished.")
+            if running:
+                Job.objects.filter(pk__in=running.values(), worker=name).update(heartbeat_at=timezone.now())
+
+
+# Tasks. Each takes the progress callback first and returns a JSON-serializable result.
+
+@task
+def purge_deleted(progress, chunk_size=None, pause=None):
+    return deletion.purge_deleted(progress=progress, chunk_size=chunk_size, pause=pause)
+
+
+@task
+def forecast_inventory(progress, window_days=None, lead_time_days=None, service_z=None, chunk_size=None):
+    processed = forecasting.compute_forecasts(
+        window_days=window_days, lead_time_days=lead_time_days, service_z=service_z, chunk_size=chunk_size, progress=progress,
+    )
+    return {'processed': processed}
+
+
+@task
+def reconcile_category_counters(progress):
+    fixed = counters.reconcile_category_counters()
+    return {'corrected': [category.category for category, _ in fixed]}
+
+
+@task
+def backfill_thumbnails(progress):
+    """Generate the missing item image thumbnails."""
+    items = InventoryItem.objects.exclude(item_image='').exclude(item_image__isnull=True).order_by('pk')
+    total = items.count()
+    generated, missing = 0, 0
+    for done, item in enumerate(items.iterator(chunk_size=500), 1):
+        thumbnail = item.item_image_thumbnail
+        if not item.item_image.storage.exists(item.item_image.name):
+            missing += 1  # Nothing to make a thumbnail from
+        elif not thumbnail.storage.exists(thumbnail.name):
+            thumbnail.generate()
+            generated += 1
+        progress(f"{done} of {total} images checked", percent=100 * done / total)
+    return {'checked': total, 'generated': generated, 'missing': missing}
+
+
+@task(private_args=True)
+def provision_users(progress, rows):
+    """Create the users of a provisioning CSV, as read by provisioning.read_user_csv()."""
+    from .provisioning import provision_users  # provisioning.py imports the serializers, which import this module
+
+    created, errors = provision_users(rows, progress=progress)
+    return {'created': created, 'errors': errors}
@@ -0,0 +1,295 @@
+import json
+import sys
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, migrations
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+from django.db.models import F, Index, UniqueConstraint
+from django.db.models.expressions import Col, OrderBy
+from django.db.models.sql.where import AND, WhereNode
+from django.urls import URLPattern, URLResolver
+from django.utils import timezone
+from django_filters import rest_framework as django_filters
+from rest_framework.exceptions import APIException
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.mixins import ListModelMixin
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from inventory_app import urls
+from inventory_app.async_views import AsyncListView
+
+EQUALITY_LOOKUPS = {'exact', 'iexact', 'in', 'isnull'}
+RANGE_LOOKUPS = {'gt', 'gte', 'lt', 'lte', 'range', 'startswith'}
+MAX_INDEX_FIELDS = 3
+UNINDEXABLE_TYPES = {'TextField', 'JSONField', 'BinaryField', 'FileField', 'ImageField'}
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the list querysets behind inventory_app's URLs across filter, search and ordering "
+        "combinations, flag full scans and filesorts, and propose composite indexes. "
+        "Run it against a seeded database; small tables are often scanned regardless of indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--write-migration', action='store_true', help='Write the proposed indexes as an inventory_app migration.')
+        parser.add_argument('--check', action='store_true', help='Exit with status 1 when an index is proposed (for CI).')
+        parser.add_argument('--all', action='store_true', help='List every query explained, not only the flagged ones.')
+
+    def handle(self, *args, **options):
+        self.factory = APIRequestFactory()
+        self.page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE') or 10
+        proposals = {}  # (model, fields) -> descriptions of the queries that need it
+        flagged = explained = 0
+
+        for name, view_class in get_list_views(urls.urlpatterns):
+            if any(issubclass(backend, OrderingFilter) for backend in getattr(view_class, 'filter_backends', [])) and getattr(view_class, 'ordering_fields', None) is None:
+                self.stdout.write(f"note        {name} accepts ?ordering= on every serializer field; set ordering_fields")
+            for user_label, user in get_users():
+                for query_string, queryset in self.get_querysets(view_class, user):
+                    explained += 1
+                    issues = get_plan_issues(queryset)
+                    description = f"{name} [{user_label}] ?{query_string}"
+                    if not issues:
+                        if options['all']:
+                            self.stdout.write(f"ok          {description}")
+                        continue
+                    flagged += 1
+                    self.stdout.write(self.style.WARNING(f"{' '.join(sorted(issues)):<11} {description}"))
+                    fields = propose_index(queryset)
+                    if fields:
+                        proposals.setdefault((queryset.model, fields), []).append(description)
+
+        self.stdout.write(f"\n{explained} queries explained on {connection.vendor}, {flagged} flagged.")
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS("No new indexes proposed."))
+            return
+
+        self.stdout.write("\nProposed indexes:")
+        indexes = []
+        for (model, fields), descriptions in proposals.items():
+            index = Index(fields=list(fields), name='')
+            index.set_name_with_model(model)
+            indexes.append((model, index))
+            self.stdout.write(f"  {model.__name__}: models.Index(fields={list(fields)!r}, name={index.name!r})  # {len(descriptions)} queries, e.g. {descriptions[0]}")
+        self.stdout.write("Add these to the models' Meta.indexes as well, or makemigrations will try to remove them.")
+
+        if options['write_migration']:
+            self.write_migration(indexes)
+        if options['check']:
+            sys.exit(1)
+
+    def get_querysets(self, view_class, user):
+        """Yield (query string, queryset) for the filter, search and ordering combinations a view accepts."""
+        view = self.make_view(view_class, user, {})
+        try:
+            base = view.get_queryset()
+        except Exception as exc:
+            self.stderr.write(f"Skipping {view_class.__name__}: {exc}")
+            return
+        if isinstance(view, AsyncListView):
+            yield '', base.order_by(*view.ordering)[:self.page_size]
+            return
+
+        filter_params = [{}] + [{name: value} for name, value in get_filter_samples(view, base)]
+        ordering_params = [{}] + [{'ordering': prefix + field} for field in get_ordering_fields(view, base) for prefix in ('', '-')]
+        if any(isinstance(backend(), SearchFilter) for backend in view.filter_backends) and getattr(view, 'search_fields', None):
+            filter_params.append({'search': 'a'})
+
+        for filters in filter_params:
+            for ordering in ordering_params:
+                params = {**filters, **ordering}
+                view = self.make_view(view_class, user, params)
+                try:
+                    queryset = view.filter_queryset(view.get_queryset())
+                except APIException:
+                    continue  # Sample value rejected by the filterset
+                yield '&'.join(f"{key}={value}" for key, value in params.items()), queryset[:self.page_size]
+
+    def make_view(self, view_class, user, params):
+        request = Request(self.factory.get('/', params))
+        request.user = user
+        view = view_class()
+        view.request, view.args, view.kwargs, view.format_kwarg = request, (), {}, None
+        view.drf_request = request  # AsyncAPIView
+        return view
+
+    def write_migration(self, indexes):
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        leaf = loader.graph.leaf_nodes('inventory_app')[0]
+        number = (MigrationAutodetector.parse_number(leaf[1]) or 0) + 1
+        migration = migrations.Migration(f"{number:04d}_advised_indexes", 'inventory_app')
+        migration.dependencies = [leaf]
+        migration.operations = [migrations.AddIndex(model_name=model._meta.model_name, index=index) for model, index in indexes]
+        writer = MigrationWriter(migration)
+        with open(writer.path, 'w') as migration_file:
+            migration_file.write(writer.as_string())
+        self.stdout.write(self.style.SUCCESS(f"Wrote {writer.path}"))
+
+
+def get_list_views(patterns, prefix=''):
+    """(url name, view class) for every list view under the given URL patterns."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from get_list_views(pattern.url_patterns, prefix + str(pattern.pattern))
+            continue
+        if not isinstance(pattern, URLPattern):
+            continue
+        view_class = getattr(pattern.callback, 'view_class', None) or getattr(pattern.callback, 'cls', None)
+        if view_class is None:
+            continue
+        if issubclass(view_class, AsyncListView) or (issubclass(view_class, ListModelMixin) and hasattr(view_class, 'get_queryset')):
+            yield pattern.name or prefix + str(pattern.pattern), view_class
+
+
+def get_users():
+    # Staff see every row; other users' querysets are scoped to them, which needs its own index
+    User = get_user_model()
+    staff = User.objects.filter(is_staff=True).first() or User(pk=1, is_staff=True)
+    regular = User.objects.filter(is_staff=False).first() or User(pk=2, is_staff=False)
+    for user in (staff, regular):
+        user._state.adding = False
+    return [('staff', staff), ('user', regular)]
+
+
+def get_filter_samples(view, queryset):
+    """(query parameter, sample value) for each filter the view's filterset declares."""
+    for backend in view.filter_backends:
+        if not issubclass(backend, django_filters.DjangoFilterBackend):
+            continue
+        filterset_class = backend().get_filterset_class(view, queryset)
+        if filterset_class is None:
+            continue
+        for name, filter_ in filterset_class.base_filters.items():
+            yield name, get_sample_value(queryset, filter_)
+
+
+def get_sample_value(queryset, filter_):
+    if isinstance(filter_, (django_filters.IsoDateTimeFilter, django_filters.DateTimeFilter)):
+        return timezone.now().isoformat()
+    if isinstance(filter_, django_filters.NumberFilter) and filter_.method:
+        return '1'
+    if not filter_.method:
+        try:
+            value = queryset.order_by().values_list(filter_.field_name, flat=True).exclude(**{f"{filter_.field_name}__isnull": True}).first()
+        except Exception:
+            value = None
+        if value is not None:
+            return value
+    return '1'
+
+
+def get_ordering_fields(view, queryset):
+    # Only orderings a view declares; without ordering_fields DRF accepts every serializer
+    # field, which is reported separately rather than explained one by one.
+    if not any(issubclass(backend, OrderingFilter) for backend in view.filter_backends):
+        return []
+    fields = getattr(view, 'ordering_fields', None)
+    if fields is None or fields == '__all__':
+        return []
+    return list(fields)
+
+
+def get_plan_issues(queryset):
+    """Flags ('FULL-SCAN', 'FILESORT') found in the backend's plan for ``queryset``."""
+    vendor = connection.vendor
+    issues = set()
+    if vendor in ('mysql', 'postgresql'):
+        plan = json.loads(queryset.explain(format='JSON' if vendor == 'mysql' else 'json'))
+        for node in walk(plan):
+            if node.get('access_type') == 'ALL' or node.get('Node Type') == 'Seq Scan':
+                issues.add('FULL-SCAN')
+            if node.get('using_filesort') or node.get('Node Type') == 'Sort':
+                issues.add('FILESORT')
+    else:
+        for line in queryset.explain().splitlines():
+            detail = line.split(maxsplit=3)[-1]
+            if detail.startswith('SCAN ') and ' USING ' not in detail and 'TABLE' not in detail:
+                issues.add('FULL-SCAN')
+            if 'USE TEMP B-TREE FOR ORDER BY' in detail:
+                issues.add('FILESORT')
+    return issues
+
+
+def walk(node):
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from walk(value)
+
+
+def propose_index(queryset):
+    """A composite index on the queryset's own table: equality columns, then the ordering or range column.
+
+    Returns None when an existing index already starts with those fields, or there is nothing to index
+    (joined tables, OR-ed filters and contains/icontains searches are not considered).
+    """
+    model = queryset.model
+    equality, ranges = [], []
+    collect_lookups(queryset.query.where, model, equality, ranges)
+    ordering = []
+    for entry in queryset.query.order_by or model._meta.ordering:
+        name = get_ordering_name(entry)
+        if name is None:
+            break
+        name = name.lstrip('-')
+        if name in ('pk', model._meta.pk.name) or '__' in name:
+            break
+        try:
+            field = model._meta.get_field(name)
+        except Exception:
+            break
+        if field.get_internal_type() in UNINDEXABLE_TYPES:
+            break
+        ordering.append(field.name)
+
+    fields = list(dict.fromkeys(equality + (ordering or ranges[:1])))[:MAX_INDEX_FIELDS]
+    if not fields or is_indexed(model, fields):
+        return None
+    return tuple(fields)
+
+
+def get_ordering_name(entry):
+    """'field' or '-field' for an ordering entry; None for expressions other than a plain F() or OrderBy(F())."""
+    if isinstance(entry, str):
+        return entry
+    descending = False
+    if isinstance(entry, OrderBy):
+        descending = entry.descending
+        entry = entry.expression
+    if isinstance(entry, F):
+        return ('-' if descending else '') + entry.name
+    return None
+
+
+def collect_lookups(where, model, equality, ranges):
+    for child in where.children:
+        if isinstance(child, WhereNode):
+            if child.connector == AND and not child.negated:
+                collect_lookups(child, model, equality, ranges)
+            continue
+        lhs = getattr(child, 'lhs', None)
+        if not isinstance(lhs, Col) or lhs.target.model is not model or lhs.target.primary_key:
+            continue
+        if lhs.target.get_internal_type() in UNINDEXABLE_TYPES:
+            continue
+        if child.lookup_name in EQUALITY_LOOKUPS:
+            equality.append(lhs.target.name)
+        elif child.lookup_name in RANGE_LOOKUPS:
+            ranges.append(lhs.target.name)
+
+
+def is_indexed(model, fields):
+    existing = [[field.lstrip('-') for field in index.fields] for index in model._meta.indexes]
+    existing += [list(fields) for fields in model._meta.unique_together]
+    existing += [list(constraint.fields) for constraint in model._meta.constraints if isinstance(constraint, UniqueConstraint) and constraint.fields and constraint.condition is None]
+    existing += [[field.name] for field in model._meta.concrete_fields if field.primary_key or field.unique or field.db_index]
+    return any(index[:len(fields)] == fields for index in existing)
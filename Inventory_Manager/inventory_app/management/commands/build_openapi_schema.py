@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory_app.schema import build_schema, get_schema_dir
+
+
+class Command(BaseCommand):
+    help = 'Generate the OpenAPI schema into OPENAPI_SCHEMA_DIR for the /swagger/ and /redoc/ pages (run at deploy).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=3, help='Older schema versions to keep alongside the new one.')
+
+    def handle(self, *args, **options):
+        name = build_schema(keep=options['keep'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {get_schema_dir() / name}"))
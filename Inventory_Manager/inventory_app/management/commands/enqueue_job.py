@@ -0,0 +1,26 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory_app.jobs import TASKS, enqueue
+
+
+class Command(BaseCommand):
+    help = 'Add a background job for `manage.py run_jobs`, e.g. from cron: enqueue_job purge_deleted --args \'{"pause": 0.5}\''
+
+    def add_arguments(self, parser):
+        parser.add_argument('task', choices=sorted(TASKS))
+        parser.add_argument('--args', dest='task_args', default='{}', help='Keyword arguments of the task, as a JSON object.')
+
+    def handle(self, *args, **options):
+        try:
+            task_args = json.loads(options['task_args'])
+        except ValueError as error:
+            raise CommandError(f"--args is not valid JSON: {error}")
+        if not isinstance(task_args, dict):
+            raise CommandError("--args must be a JSON object.")
+        try:
+            job = enqueue(options['task'], task_args)
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(f"Queued job {job.pk} ({job.task})."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory_app.provisioning import read_user_csv, provision_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Create user accounts from a CSV file with the columns email, username, first_name, last_name "
+        "and optionally password. Nothing is created when any row is invalid."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to read.')
+        parser.add_argument('--workers', type=int, help='Processes hashing passwords (default: PROVISION_HASH_WORKERS or every CPU).')
+        parser.add_argument('--dry-run', action='store_true', help='Only validate the file.')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as csv_file:
+                rows = read_user_csv(csv_file)
+        except (OSError, ValueError) as exc:
+            raise CommandError(exc)
+
+        created, errors = provision_users(rows, workers=options['workers'], dry_run=options['dry_run'])
+        for error in errors:
+            details = '; '.join(f"{field}: {' '.join(map(str, messages))}" for field, messages in error['errors'].items())
+            self.stderr.write(f"line {error['line']}: {details}")
+        if errors:
+            raise CommandError(f"{len(errors)} invalid rows; no users were created.")
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"{len(rows)} rows are valid."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Created {created} users."))
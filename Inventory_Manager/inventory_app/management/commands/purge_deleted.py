@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from inventory_app.deletion import purge_deleted
+
+
+class Command(BaseCommand):
+    help = 'Remove soft-deleted items and users with their change logs, in chunks of PURGE_CHUNK_SIZE rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, help='Rows deleted per transaction (default: PURGE_CHUNK_SIZE).')
+        parser.add_argument('--pause', type=float, help='Seconds to wait between chunks (default: PURGE_CHUNK_PAUSE_SECONDS).')
+
+    def handle(self, *args, **options):
+        progress = self.stdout.write if options['verbosity'] > 0 else None
+        totals = purge_deleted(progress=progress, chunk_size=options['chunk_size'], pause=options['pause'])
+        summary = ', '.join(f"{count} {label}" for label, count in sorted(totals.items())) or 'nothing'
+        self.stdout.write(self.style.SUCCESS(f"Purged {summary}."))
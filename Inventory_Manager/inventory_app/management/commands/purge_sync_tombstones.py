@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory_app.models import InventoryItemTombstone
+
+
+class Command(BaseCommand):
+    help = 'Delete item tombstones older than SYNC_TOMBSTONE_TTL.'
+
+    def handle(self, *args, **options):
+        deleted, _ = InventoryItemTombstone.objects.filter(deleted_at__lt=timezone.now() - settings.SYNC_TOMBSTONE_TTL).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired item tombstones."))
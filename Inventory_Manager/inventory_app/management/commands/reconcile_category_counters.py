@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from inventory_app.counters import reconcile_category_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute each category's item_count, total_quantity and total_value from its items and fix any drift."
+
+    def handle(self, *args, **options):
+        fixed = reconcile_category_counters()
+        for category, totals in fixed:
+            self.stdout.write(self.style.WARNING(
+                f"{category.category}: items {category.item_count} -> {totals['item_count']}, "
+                f"quantity {category.total_quantity} -> {totals['total_quantity']}, "
+                f"value {category.total_value} -> {totals['total_value']}"
+            ))
+        self.stdout.write(self.style.SUCCESS(f"Reconciled category counters, {len(fixed)} corrected."))
@@ -0,0 +1,35 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from inventory_app.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the job table until stopped (SIGTERM/SIGINT let running jobs finish first).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Jobs run at once (default: JOB_WORKERS).')
+        parser.add_argument('--pool', choices=['process', 'thread'], help='Run jobs in processes or threads (default: JOB_POOL).')
+        parser.add_argument('--poll-seconds', type=float, help='How often to look for ready jobs when idle (default: JOB_POLL_SECONDS).')
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is ready instead of waiting for more.')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+
+        def request_stop(signum, frame):
+            self.stdout.write("Stopping after the running jobs finish...")
+            stop.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+        run_worker(
+            workers=options['workers'],
+            pool=options['pool'],
+            poll_seconds=options['poll_seconds'],
+            burst=options['burst'],
+            stop=stop,
+            log=self.stdout.write if options['verbosity'] > 0 else None,
+        )
+        self.stdout.write(self.style.SUCCESS("Worker stopped."))
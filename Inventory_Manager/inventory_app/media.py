@@ -0,0 +1,186 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotModified, StreamingHttpResponse
+from django.urls import reverse
+from django.utils._os import safe_join
+from django.utils.crypto import constant_time_compare
+from django.utils.deconstruct import deconstructible
+from django.utils.http import http_date
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+# Uploads are stored as "<prefix>/<2 hex chars>/<16 hex chars of the content's SHA-256><ext>".
+# A name never changes meaning, so a URL to it can be cached until the signature expires.
+@deconstructible
+class HashedUploadTo:
+    def __init__(self, prefix, field_name):
+        self.prefix = prefix
+        self.field_name = field_name
+
+    def __call__(self, instance, filename):
+        upload = getattr(instance, self.field_name)
+        digest = hashlib.sha256()
+        for chunk in upload.chunks():
+            digest.update(chunk)
+        upload.seek(0)
+        name = digest.hexdigest()[:16]
+        return posixpath.join(self.prefix, name[:2], name + os.path.splitext(filename)[1].lower())
+
+
+# Storage for those names: an existing file already has the same content, so it is reused
+# instead of being stored again under a suffixed name.
+class HashedFileSystemStorage(FileSystemStorage):
+    def __init__(self, **kwargs):
+        super().__init__(allow_overwrite=True, **kwargs)
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+hashed_storage = HashedFileSystemStorage()
+
+
+# Media URLs carry the user they were issued to, an expiry and an HMAC over both and the path:
+# /media/<path>?u=<user id>&exp=<unix time>&sig=<signature>. The expiry is rounded up to
+# MEDIA_URL_ROUNDING, so the same user gets the same URL (and browser cache hits) for a while.
+# URLs are only issued to the owner of the file's object or to staff (SignedImageField).
+def _signature(path, user_id, expires):
+    return signing.Signer(salt='inventory_app.media').signature(f'{path}\n{user_id}\n{expires}')
+
+
+def get_signed_media_url(path, user):
+    """URL of the protected media view for ``path``, valid for ``user`` until the rounded expiry."""
+    rounding = int(settings.MEDIA_URL_ROUNDING.total_seconds())
+    expires = (int(time.time()) // rounding + 1) * rounding + int(settings.MEDIA_URL_TTL.total_seconds())
+    user_id = user.pk
+    query = urlencode({'u': user_id, 'exp': expires, 'sig': _signature(path, user_id, expires)})
+    return f"{reverse('protected_media', args=[path])}?{query}"
+
+
+def check_media_signature(request, path):
+    """Seconds the request's signature remains valid, or None when it is missing, wrong or expired,
+    or the user it was issued to has been deactivated or deleted since.
+    """
+    try:
+        user_id, expires = int(request.GET['u']), int(request.GET['exp'])
+        signature = request.GET['sig']
+    except (KeyError, ValueError):
+        return None
+    remaining = expires - int(time.time())
+    if remaining <= 0 or not constant_time_compare(signature, _signature(path, user_id, expires)):
+        return None
+    # Browsers fetch these URLs without the API's bearer token, so the signed user stands in for
+    # the requester; their URLs stop working as soon as they lose access.
+    if not get_user_model().objects.filter(pk=user_id, is_active=True, deleted_at__isnull=True).exists():
+        return None
+    return remaining
+
+
+def protected_media(request, path):
+    """Serve a media file to a signed URL (or a staff session, for the admin).
+
+    With MEDIA_SERVE_MODE set the front server sends the file (X-Accel-Redirect for nginx,
+    X-Sendfile for Apache/lighttpd) and handles ranges itself; otherwise it is streamed here.
+    """
+    remaining = check_media_signature(request, path)
+    if remaining is not None:
+        cache_control = f'private, max-age={min(remaining, 31536000)}, immutable'
+    elif request.user.is_authenticated and request.user.is_staff:
+        cache_control = 'private, no-cache'
+    else:
+        return HttpResponseForbidden("Invalid or expired media URL.")
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("File not found.")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found.")
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    mode = settings.MEDIA_SERVE_MODE
+    if mode in ('x-accel-redirect', 'x-sendfile'):
+        response = HttpResponse(content_type=content_type)
+        if mode == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + path
+        else:
+            response['X-Sendfile'] = full_path
+    else:
+        response = _serve_file(request, full_path, content_type)
+    response['Cache-Control'] = cache_control
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+def _serve_file(request, full_path, content_type):
+    # Fallback when no front server is configured: conditional GET and single byte ranges
+    stat = os.stat(full_path)
+    etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    byte_range = _parse_range(request, etag, stat.st_size)
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+    elif byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(full_path, start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
+
+
+def _parse_range(request, etag, size):
+    """(start, end) of a single satisfiable byte range, 'unsatisfiable', or None for the whole file."""
+    header = request.headers.get('Range')
+    if not header or request.method not in ('GET', 'HEAD'):
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag:
+        return None  # The client's copy is stale: send the whole file
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None  # Multiple or malformed ranges: the whole file is a valid answer
+    first, last = match.groups()
+    if first == '':
+        start, end = max(size - int(last), 0), size - 1  # Suffix range: the last N bytes
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
+
+def _read_range(full_path, start, end):
+    with open(full_path, 'rb') as media_file:
+        media_file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = media_file.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,179 @@
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .profiling import new_profile_path, run_profiled, start_profiler, stop_profiler
+from .routers import RoutingState, _routing_state, pin_to_primary
+
+PROFILE_MODES = {'1': 'cprofile', 'true': 'cprofile', 'cprofile': 'cprofile', 'sample': 'sample'}
+
+
+# Runs a single request under a profiler when a staff user asks for it with the
+# "X-Profile" header or the "_profile" query parameter ("1"/"cprofile" or "sample").
+class RequestProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        self.loop_profile_active = False
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        mode = self._requested_mode(request)
+        if mode is None or not self._is_staff(request):
+            return self.get_response(request)
+        return self._profile(request, mode, self.get_response)
+
+    async def __acall__(self, request):
+        mode = self._requested_mode(request)
+        if mode is None or not await sync_to_async(self._is_staff)(request):
+            return await self.get_response(request)
+        if self._is_async_view(request):
+            return await self._profile_event_loop(request, mode)
+        # Profile from a worker thread; sync views called further down the chain are
+        # routed back to this same thread, so the profiler sees the whole request.
+        return await sync_to_async(self._profile)(request, mode, async_to_sync(self.get_response))
+
+    async def _profile_event_loop(self, request, mode):
+        # Async views (the async API, the change feed) run on the event loop, so that thread is
+        # profiled across the awaits, including whatever else the loop runs meanwhile. A streamed
+        # response is profiled until the stream ends. Only one at a time: a thread has one profiler.
+        if self.loop_profile_active:
+            return await self.get_response(request)
+        self.loop_profile_active = True
+        path = new_profile_path(mode, request.path)
+        profiler = start_profiler(mode)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            self._stop_loop_profile(profiler, path)
+            raise
+        response['X-Profile-Id'] = path.name
+        if response.streaming and response.is_async:
+            response.streaming_content = self._profiled_stream(response.streaming_content, profiler, path)
+        else:
+            self._stop_loop_profile(profiler, path)
+        return response
+
+    async def _profiled_stream(self, content, profiler, path):
+        try:
+            async for chunk in content:
+                yield chunk
+        finally:
+            self._stop_loop_profile(profiler, path)
+
+    def _stop_loop_profile(self, profiler, path):
+        stop_profiler(profiler, path)
+        self.loop_profile_active = False
+
+    @staticmethod
+    def _is_async_view(request):
+        try:
+            match = resolve(request.path_info, getattr(request, 'urlconf', None))
+        except Resolver404:
+            return False
+        return iscoroutinefunction(match.func)
+
+    @staticmethod
+    def _requested_mode(request):
+        # Plain dict lookups only, so unprofiled requests pay next to nothing.
+        flag = request.META.get('HTTP_X_PROFILE') or request.GET.get('_profile')
+        if not flag:
+            return None
+        return PROFILE_MODES.get(flag.lower())
+
+    @staticmethod
+    def _is_staff(request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return True
+        # API clients authenticate with JWT inside DRF, after the middleware has run.
+        try:
+            authenticated = JWTAuthentication().authenticate(request)
+        except (AuthenticationFailed, InvalidToken):
+            return False
+        return authenticated is not None and authenticated[0].is_staff
+
+    @staticmethod
+    def _profile(request, mode, get_response):
+        response, profile_name = run_profiled(mode, request.path, get_response, request)
+        response['X-Profile-Id'] = profile_name
+        return response
+
+
+# Sends reads from safe (GET/HEAD/OPTIONS) requests to a replica, and pins a user to
+# the primary for REPLICA_PIN_SECONDS after they write so they always read their own writes.
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _routing_state.set(RoutingState(request.method in SAFE_METHODS, request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+        self._record_write(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = _routing_state.set(RoutingState(request.method in SAFE_METHODS, request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+        await sync_to_async(self._record_write)(request, response)
+        return response
+
+    @staticmethod
+    def _record_write(request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(user)
+
+
+# Adds X-RateLimit-* headers for requests that went through TokenBucketThrottle.
+class RateLimitHeadersMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self._add_headers(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._add_headers(request, await self.get_response(request))
+
+    @staticmethod
+    def _add_headers(request, response):
+        rate_limit = getattr(request, 'rate_limit', None)
+        if rate_limit is not None:
+            response['X-RateLimit-Limit'] = rate_limit['limit']
+            response['X-RateLimit-Remaining'] = rate_limit['remaining']
+            response['X-RateLimit-Reset'] = rate_limit['reset']
+        return response
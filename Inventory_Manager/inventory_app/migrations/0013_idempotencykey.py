@@ -0,0 +1,32 @@
+# Generated by Django 5.1.1 on 2026-10-19 12:03
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0012_inventoryitem_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=64, verbose_name='Scope')),
+                ('key', models.CharField(max_length=255, verbose_name='Idempotency Key')),
+                ('request_fingerprint', models.CharField(max_length=64, verbose_name='Request Fingerprint')),
+                ('response_status', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Response Status')),
+                ('response_body', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Response Body')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Expires At')),
+            ],
+            options={
+                'verbose_name': 'Idempotency Key',
+                'verbose_name_plural': 'Idempotency Keys',
+                'constraints': [models.UniqueConstraint(fields=('scope', 'key'), name='unique_idempotency_key_per_scope')],
+            },
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 5.1.1 on 2026-10-19 12:07
+
+import ast
+import re
+from decimal import Decimal, InvalidOperation
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def parse_legacy_details(text):
+    # Old rows hold str() of a dict, e.g. "{'item_price': {'old': Decimal('1.00'), 'new': ...}}",
+    # sometimes prefixed with "Changes: ". Anything else is kept verbatim under "legacy".
+    text = (text or '').strip()
+    if not text:
+        return {}
+    text = text.removeprefix('Changes: ')
+    text = re.sub(r"Decimal\('([^']*)'\)", r"'\1'", text)
+    text = re.sub(r"<Category: ([^>]*)>", lambda match: repr(match.group(1)), text)
+    try:
+        details = ast.literal_eval(text)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return {'legacy': text}
+    return details if isinstance(details, dict) else {'legacy': text}
+
+
+def get_change_ratio(old, new):
+    try:
+        old, new = Decimal(str(old)), Decimal(str(new))
+    except (InvalidOperation, ValueError):
+        return None
+    if not old:
+        return None
+    return ((new - old) / old).quantize(Decimal('0.0001'))
+
+
+def convert_details(apps, schema_editor):
+    InventoryChangeLog = apps.get_model('inventory_app', 'InventoryChangeLog')
+    InventoryChangeField = apps.get_model('inventory_app', 'InventoryChangeField')
+    logs = InventoryChangeLog.objects.only('pk', 'change_details_text').order_by('pk')
+    batch = []
+    for log in logs.iterator(chunk_size=BATCH_SIZE):
+        log.change_details = parse_legacy_details(log.change_details_text)
+        batch.append(log)
+        if len(batch) >= BATCH_SIZE:
+            save_batch(batch, InventoryChangeLog, InventoryChangeField)
+            batch = []
+    save_batch(batch, InventoryChangeLog, InventoryChangeField)
+
+
+def save_batch(logs, InventoryChangeLog, InventoryChangeField):
+    InventoryChangeLog.objects.bulk_update(logs, ['change_details'])
+    rows = []
+    for log in logs:
+        for field_name, change in log.change_details.items():
+            if not isinstance(change, dict) or not {'old', 'new'} <= change.keys():
+                continue
+            old, new = change['old'], change['new']
+            rows.append(InventoryChangeField(
+                change_log_id=log.pk,
+                field_name=field_name[:50],
+                old_value=None if old is None else str(old),
+                new_value=None if new is None else str(new),
+                change_ratio=None if isinstance(old, bool) or isinstance(new, bool) else get_change_ratio(old, new),
+            ))
+    InventoryChangeField.objects.bulk_create(rows)
+
+
+def restore_text(apps, schema_editor):
+    InventoryChangeLog = apps.get_model('inventory_app', 'InventoryChangeLog')
+    logs = InventoryChangeLog.objects.only('pk', 'change_details').order_by('pk')
+    batch = []
+    for log in logs.iterator(chunk_size=BATCH_SIZE):
+        log.change_details_text = str(log.change_details) if log.change_details else ''
+        batch.append(log)
+        if len(batch) >= BATCH_SIZE:
+            InventoryChangeLog.objects.bulk_update(batch, ['change_details_text'])
+            batch = []
+    InventoryChangeLog.objects.bulk_update(batch, ['change_details_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0013_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='inventorychangelog',
+            old_name='change_details',
+            new_name='change_details_text',
+        ),
+        migrations.AddField(
+            model_name='inventorychangelog',
+            name='change_details',
+            field=models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Change Details'),
+        ),
+        migrations.CreateModel(
+            name='InventoryChangeField',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field_name', models.CharField(max_length=50, verbose_name='Field Name')),
+                ('old_value', models.TextField(blank=True, null=True, verbose_name='Old Value')),
+                ('new_value', models.TextField(blank=True, null=True, verbose_name='New Value')),
+                ('change_ratio', models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True, verbose_name='Relative Change')),
+                ('change_log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='field_changes', to='inventory_app.inventorychangelog', verbose_name='Change Log')),
+            ],
+            options={
+                'verbose_name': 'Inventory Change Field',
+                'verbose_name_plural': 'Inventory Change Fields',
+                'indexes': [models.Index(fields=['field_name', 'change_ratio'], name='change_field_name_ratio_idx')],
+            },
+        ),
+        migrations.RunPython(convert_details, restore_text),
+        migrations.RemoveField(
+            model_name='inventorychangelog',
+            name='change_details_text',
+        ),
+    ]
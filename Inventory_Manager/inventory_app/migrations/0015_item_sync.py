@@ -0,0 +1,49 @@
+# Generated by Django 5.1.1 on 2026-10-19 12:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0014_structured_change_details'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryItemTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_id', models.BigIntegerField(verbose_name='Item ID')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Deleted At')),
+            ],
+            options={
+                'verbose_name': 'Inventory Item Tombstone',
+                'verbose_name_plural': 'Inventory Item Tombstones',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['owner', 'last_updated', 'id'], name='item_owner_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['last_updated', 'id'], name='item_sync_idx'),
+        ),
+        migrations.AddField(
+            model_name='inventoryitemtombstone',
+            name='owner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='item_tombstones', to=settings.AUTH_USER_MODEL, verbose_name='Owner'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitemtombstone',
+            index=models.Index(fields=['owner', 'deleted_at', 'id'], name='tombstone_owner_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitemtombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='tombstone_sync_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.1 on 2026-10-19 12:18
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def fill_counters(apps, schema_editor):
+    Category = apps.get_model('inventory_app', 'Category')
+    InventoryItem = apps.get_model('inventory_app', 'InventoryItem')
+    totals = InventoryItem.objects.filter(category__isnull=False).values('category_id').annotate(
+        item_count=Count('id'),
+        total_quantity=Sum('item_qty'),
+        total_value=Sum(F('item_qty') * F('item_price')),
+    ).order_by()
+    for row in totals:
+        Category.objects.filter(pk=row['category_id']).update(
+            item_count=row['item_count'],
+            total_quantity=row['total_quantity'] or 0,
+            total_value=row['total_value'] or Decimal(0),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0015_item_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='item_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Item Count'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='total_quantity',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Total Quantity'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='total_value',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=18, verbose_name='Total Value'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-19 12:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0016_category_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryForecast',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='forecast', serialize=False, to='inventory_app.inventoryitem', verbose_name='Inventory Item')),
+                ('daily_consumption', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Average Daily Consumption')),
+                ('consumption_std', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Daily Consumption Std. Dev.')),
+                ('days_until_stockout', models.DecimalField(blank=True, decimal_places=1, max_digits=10, null=True, verbose_name='Days Until Stockout')),
+                ('suggested_threshold', models.PositiveIntegerField(verbose_name='Suggested Low Stock Threshold')),
+                ('window_days', models.PositiveIntegerField(verbose_name='Window (days)')),
+                ('computed_at', models.DateTimeField(verbose_name='Computed At')),
+            ],
+            options={
+                'verbose_name': 'Inventory Forecast',
+                'verbose_name_plural': 'Inventory Forecasts',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inventorychangelog',
+            index=models.Index(fields=['inventory_item', 'date_changed'], name='changelog_item_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryforecast',
+            index=models.Index(fields=['days_until_stockout'], name='forecast_stockout_idx'),
+        ),
+    ]
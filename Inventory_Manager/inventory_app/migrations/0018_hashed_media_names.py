@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-19 12:26
+
+import inventory_app.media
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0017_inventory_forecast'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='profile_picture',
+            field=models.ImageField(blank=True, null=True, storage=inventory_app.media.HashedFileSystemStorage(), upload_to=inventory_app.media.HashedUploadTo('profile_pics', 'profile_picture'), verbose_name='Profile Picture'),
+        ),
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='item_image',
+            field=models.ImageField(blank=True, null=True, storage=inventory_app.media.HashedFileSystemStorage(), upload_to=inventory_app.media.HashedUploadTo('item_images', 'item_image'), verbose_name='Item Image'),
+        ),
+    ]
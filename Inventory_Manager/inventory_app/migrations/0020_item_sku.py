@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-19 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0019_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='SKU / Barcode'),
+        ),
+        migrations.AddConstraint(
+            model_name='inventoryitem',
+            constraint=models.UniqueConstraint(fields=('owner', 'sku'), name='unique_item_sku_per_owner'),
+        ),
+    ]
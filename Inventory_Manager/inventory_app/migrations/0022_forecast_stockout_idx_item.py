@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-19 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0021_job'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='inventoryforecast',
+            name='forecast_stockout_idx',
+        ),
+        migrations.AddIndex(
+            model_name='inventoryforecast',
+            index=models.Index(fields=['days_until_stockout', 'item'], name='forecast_stockout_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-19 13:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0022_forecast_stockout_idx_item'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventorychangelog',
+            index=models.Index(fields=['changed_by', 'date_changed'], name='changelog_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['created_at'], name='job_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['created_by', 'created_at'], name='job_user_created_idx'),
+        ),
+    ]
@@ -1,17 +1,23 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
+from decimal import Decimal, InvalidOperation
 from django.core.exceptions import ValidationError
-from django.db.models.signals import pre_save
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import pre_save, post_save, post_delete, pre_delete
+from django.utils import timezone
 from django.dispatch import receiver
 from imagekit.models import ImageSpecField
 from imagekit.processors import ResizeToFill
+from .media import HashedUploadTo, hashed_storage
+from .codes import item_code_cache
 
 # Custom User model
 class CustomUser(AbstractUser):
     email = models.EmailField(unique=True, db_index=True, verbose_name="Email Address")
-    profile_picture = models.ImageField(upload_to='profile_pics/', null=True, blank=True, verbose_name='Profile Picture')
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Deleted At")  # Soft-deleted, see deletion.py
+    profile_picture = models.ImageField(upload_to=HashedUploadTo('profile_pics', 'profile_picture'), storage=hashed_storage, null=True, blank=True, verbose_name='Profile Picture')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -27,6 +33,10 @@ class CustomUser(AbstractUser):
 class Category(models.Model):
     category = models.CharField(max_length=100, unique=True, db_index=True, verbose_name='Category Name')
     cat_description = models.TextField(blank=True, null=True, verbose_name='Description')
+    # Maintained by counters.py on every item write; fix drift with `manage.py reconcile_category_counters`
+    item_count = models.IntegerField(default=0, editable=False, verbose_name='Item Count')
+    total_quantity = models.BigIntegerField(default=0, editable=False, verbose_name='Total Quantity')
+    total_value = models.DecimalField(max_digits=18, decimal_places=2, default=0, editable=False, verbose_name='Total Value')
 
     class Meta:
         verbose_name = "Category"
@@ -35,9 +45,17 @@ class Category(models.Model):
     def __str__(self):
         return self.category
 
+# Soft-deleted items stay in the table until `manage.py purge_deleted` removes them; the
+# default manager hides them everywhere. all_objects includes them.
+class ActiveInventoryItemManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 # Inventory Item model
 class InventoryItem(models.Model):
     item_name = models.CharField(max_length=100, db_index=True)
+    sku = models.CharField(max_length=64, null=True, blank=True, verbose_name='SKU / Barcode')  # Unique per owner, looked up at /api/inventory/by-code/
     item_description = models.TextField(blank=True, null=True, verbose_name='Item Description')
     item_qty = models.PositiveIntegerField(default=0, verbose_name='Item Quantity')
     item_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Item Price')
@@ -46,8 +64,12 @@ class InventoryItem(models.Model):
     date_added = models.DateTimeField(auto_now_add=True, verbose_name='Date Added')
     last_updated = models.DateTimeField(auto_now=True, verbose_name='Last Updated')
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='inventory_items', verbose_name='Owner')
-    item_image = models.ImageField(upload_to='item_images/', null=True, blank=True, verbose_name='Item Image')
+    item_image = models.ImageField(upload_to=HashedUploadTo('item_images', 'item_image'), storage=hashed_storage, null=True, blank=True, verbose_name='Item Image')
+    version = models.PositiveIntegerField(default=1, verbose_name='Version')  # Bumped on every update, used for If-Match checks
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True, verbose_name='Deleted At')  # Soft-deleted, see deletion.py
 
+    objects = ActiveInventoryItemManager()
+    all_objects = models.Manager()
     
     item_image_thumbnail = ImageSpecField(
         source='item_image',
@@ -58,10 +80,24 @@ class InventoryItem(models.Model):
     class Meta:
         verbose_name = 'Inventory Item'
         verbose_name_plural = 'Inventory Items'
+        indexes = [
+            # Keyset scans for the delta sync API, per owner and across owners (staff)
+            models.Index(fields=['owner', 'last_updated', 'id'], name='item_owner_sync_idx'),
+            models.Index(fields=['last_updated', 'id'], name='item_sync_idx'),
+        ]
+        constraints = [
+            # Also the index behind code lookups. Soft-deleting an item clears its code, so it can be reused at once.
+            models.UniqueConstraint(fields=['owner', 'sku'], name='unique_item_sku_per_owner'),
+        ]
 
     def __str__(self):
         return f"{self.item_name} (Quantity: {self.item_qty})"
 
+    def save(self, *args, **kwargs):
+        # The change log and category counters written by the save signals commit with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 # Inventory Change Log model
 class InventoryChangeLog(models.Model):
     inventory_item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='change_logs', verbose_name="Inventory Item")
@@ -70,7 +106,7 @@ class InventoryChangeLog(models.Model):
     reason = models.CharField(max_length=255, verbose_name="Reason for Change")
     date_changed = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Date Changed")
     changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='change_logs', verbose_name="Changed By")
-    change_details = models.TextField(verbose_name="Change Details", blank=True)  # Log other details about what changed
+    change_details = models.JSONField(verbose_name="Change Details", blank=True, default=dict, encoder=DjangoJSONEncoder)  # {field: {"old": ..., "new": ...}}
 
     class Meta:
         verbose_name = "Inventory Change Log"
@@ -81,10 +117,21 @@ class InventoryChangeLog(models.Model):
                 name='quantity_or_price_nonnull'
             ),
         ]
+        indexes = [
+            models.Index(fields=['inventory_item', 'date_changed'], name='changelog_item_date_idx'),  # Per-item history (forecasting.py)
+            models.Index(fields=['changed_by', 'date_changed'], name='changelog_user_date_idx'),  # A user's own change logs, newest first
+        ]
 
     def __str__(self):
         return f"Change for {self.inventory_item.item_name} by {self.changed_by.email}"
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        # Index the per-field changes so audit queries do not have to scan change_details
+        if adding and self.change_details:
+            InventoryChangeField.objects.bulk_create(InventoryChangeField.from_log(self))
+
     def clean(self):
         # Validate that at least one of quantity or price has changed
         if self.change_quantity == 0 and not self.change_price:
@@ -93,31 +140,269 @@ class InventoryChangeLog(models.Model):
             raise ValidationError("Change amount would result in negative inventory.")
 
 
+# One row per changed field of a change log, indexed by field name and relative change
+class InventoryChangeField(models.Model):
+    change_log = models.ForeignKey(InventoryChangeLog, on_delete=models.CASCADE, related_name='field_changes', verbose_name="Change Log")
+    field_name = models.CharField(max_length=50, verbose_name="Field Name")
+    old_value = models.TextField(null=True, blank=True, verbose_name="Old Value")
+    new_value = models.TextField(null=True, blank=True, verbose_name="New Value")
+    change_ratio = models.DecimalField(max_digits=14, decimal_places=4, null=True, blank=True, verbose_name="Relative Change")  # (new - old) / old for numeric fields
+
+    class Meta:
+        verbose_name = "Inventory Change Field"
+        verbose_name_plural = "Inventory Change Fields"
+        indexes = [
+            models.Index(fields=['field_name', 'change_ratio'], name='change_field_name_ratio_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.field_name}: {self.old_value} -> {self.new_value}"
+
+    @classmethod
+    def from_log(cls, log):
+        # Build (unsaved) rows from a log's {field: {"old": ..., "new": ...}} details
+        rows = []
+        for field_name, change in log.change_details.items():
+            if not isinstance(change, dict) or not {'old', 'new'} <= change.keys():
+                continue
+            old, new = change['old'], change['new']
+            rows.append(cls(
+                change_log_id=log.pk,
+                field_name=field_name,
+                old_value=None if old is None else str(old),
+                new_value=None if new is None else str(new),
+                change_ratio=get_change_ratio(old, new),
+            ))
+        return rows
+
+
+def get_change_ratio(old, new):
+    if isinstance(old, bool) or isinstance(new, bool):
+        return None
+    try:
+        old, new = Decimal(str(old)), Decimal(str(new))
+    except (InvalidOperation, ValueError):
+        return None
+    if not old:
+        return None
+    return ((new - old) / old).quantize(Decimal('0.0001'))
+
+
+# Fields compared when logging item changes; foreign keys are compared by id
+TRACKED_ITEM_FIELDS = ['item_name', 'item_description', 'item_qty', 'item_price', 'low_stock_threshold', 'category']
+
+def get_item_changes(previous, instance, fields=TRACKED_ITEM_FIELDS):
+    changes = {}
+    for field in fields:
+        attname = InventoryItem._meta.get_field(field).attname
+        old_value = getattr(previous, attname)
+        new_value = getattr(instance, attname)
+        if old_value != new_value:
+            changes[field] = {'old': old_value, 'new': new_value}
+    return changes
+
+
+# Stored outcome of a write request sent with an Idempotency-Key header
+class IdempotencyKey(models.Model):
+    scope = models.CharField(max_length=64, verbose_name="Scope")  # "user:<id>"; anonymous requests are not recorded
+    key = models.CharField(max_length=255, verbose_name="Idempotency Key")
+    request_fingerprint = models.CharField(max_length=64, verbose_name="Request Fingerprint")  # SHA-256 of method, path and body
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="Response Status")  # Null while in progress
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Response Body")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    expires_at = models.DateTimeField(db_index=True, verbose_name="Expires At")
+
+    class Meta:
+        verbose_name = "Idempotency Key"
+        verbose_name_plural = "Idempotency Keys"
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='unique_idempotency_key_per_scope'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key}"
+
+
+# Marks a deleted item so offline clients learn about the deletion through the sync API
+class InventoryItemTombstone(models.Model):
+    item_id = models.BigIntegerField(verbose_name="Item ID")
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='item_tombstones', verbose_name='Owner')
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name="Deleted At")
+
+    class Meta:
+        verbose_name = "Inventory Item Tombstone"
+        verbose_name_plural = "Inventory Item Tombstones"
+        indexes = [
+            models.Index(fields=['owner', 'deleted_at', 'id'], name='tombstone_owner_sync_idx'),
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f"Item {self.item_id} deleted at {self.deleted_at}"
+
+
+# Consumption forecast for an item, recomputed in batch by `manage.py forecast_inventory`
+class InventoryForecast(models.Model):
+    item = models.OneToOneField(InventoryItem, on_delete=models.CASCADE, primary_key=True, related_name='forecast', verbose_name='Inventory Item')
+    daily_consumption = models.DecimalField(max_digits=14, decimal_places=4, verbose_name='Average Daily Consumption')
+    consumption_std = models.DecimalField(max_digits=14, decimal_places=4, verbose_name='Daily Consumption Std. Dev.')
+    days_until_stockout = models.DecimalField(max_digits=10, decimal_places=1, null=True, blank=True, verbose_name='Days Until Stockout')  # Null when nothing is consumed
+    suggested_threshold = models.PositiveIntegerField(verbose_name='Suggested Low Stock Threshold')
+    window_days = models.PositiveIntegerField(verbose_name='Window (days)')
+    computed_at = models.DateTimeField(verbose_name='Computed At')
+
+    class Meta:
+        verbose_name = "Inventory Forecast"
+        verbose_name_plural = "Inventory Forecasts"
+        indexes = [
+            models.Index(fields=['days_until_stockout', 'item'], name='forecast_stockout_idx'),  # Default ordering of /api/inventory/forecasts/
+        ]
+
+    def __str__(self):
+        return f"Forecast for item {self.item_id}"
+
+
+# Background job, run by `manage.py run_jobs` (see jobs.py)
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+
+    task = models.CharField(max_length=100, verbose_name='Task')  # A name registered in jobs.TASKS
+    args = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder, verbose_name='Arguments')  # Keyword arguments of the task
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, verbose_name='Status')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='Run After')  # Pushed back between retries
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name='Max Attempts')
+    worker = models.CharField(max_length=100, blank=True, verbose_name='Worker')  # "<host>:<pid>:<id>" of the worker that claimed it
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='Heartbeat At')  # Refreshed by the worker while the job runs
+    progress = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Progress (%)')  # When the task knows its total
+    progress_message = models.CharField(max_length=255, blank=True, verbose_name='Progress Message')
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name='Result')
+    error = models.TextField(blank=True, verbose_name='Error')  # Traceback of the last failed attempt
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs', verbose_name='Created By')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Created At')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Started At')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Finished At')
+
+    class Meta:
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_ready_idx'),  # Claimed by workers (jobs.claim_jobs)
+            models.Index(fields=['created_at'], name='job_created_idx'),  # Default ordering of the job list
+            models.Index(fields=['created_by', 'created_at'], name='job_user_created_idx'),  # A user's own jobs, newest first
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+# Imported here because counters.py and autocomplete.py need the models above
+from .counters import apply_item_changes, get_counter_state  # noqa: E402
+from .autocomplete import autocomplete_index  # noqa: E402
+
+
 # Signal to log changes to InventoryItem
 @receiver(pre_save, sender=InventoryItem)
 def log_inventory_item_changes(sender, instance, **kwargs):
     if instance.pk:
-        # Get the original data before changes
-        previous = InventoryItem.objects.get(pk=instance.pk)
-        changes = {}
+        # Get the original data before changes, locked so the counter delta is exact
+        previous = InventoryItem.all_objects.select_for_update().get(pk=instance.pk)
+        instance._counter_state = get_counter_state(previous)
+        instance.version = previous.version + 1
         change_quantity = instance.item_qty - previous.item_qty
         change_price = instance.item_price - previous.item_price if instance.item_price != previous.item_price else None
 
         # Compare fields to detect changes
-        fields_to_check = ['item_name', 'item_description', 'item_qty', 'item_price', 'category']
-        for field in fields_to_check:
-            old_value = getattr(previous, field)
-            new_value = getattr(instance, field)
-            if old_value != new_value:
-                changes[field] = {'old': old_value, 'new': new_value}
+        changes = get_item_changes(previous, instance)
 
         # If any changes are detected, log them
         if changes:
             InventoryChangeLog.objects.create(
                 inventory_item=instance,
-                change_quantity=change_quantity if change_quantity != 0 else None,
-                change_price=change_price if change_price is not None else None,
+                # The log requires a quantity or price; other edits record a zero quantity change
+                change_quantity=change_quantity if change_quantity != 0 or change_price is None else None,
+                change_price=change_price,
                 reason=kwargs.get('reason', 'No reason provided'),
                 changed_by=instance.owner,  # Or adjust how this is set
-                change_details=changes if changes else {}
-            )
\ No newline at end of file
+                change_details=changes
+            )
+
+
+@receiver(post_save, sender=InventoryItem)
+def log_inventory_item_creation(sender, instance, created, raw=False, **kwargs):
+    # The change log (and the change feed built on it) starts with the item's initial values
+    if not created or raw:
+        return
+    changes = {}
+    for field in TRACKED_ITEM_FIELDS:
+        value = getattr(instance, InventoryItem._meta.get_field(field).attname)
+        if value is not None:
+            changes[field] = {'old': None, 'new': value}
+    InventoryChangeLog.objects.create(
+        inventory_item=instance,
+        change_quantity=instance.item_qty,
+        reason='Item created',
+        changed_by=instance.owner,
+        change_details=changes,
+    )
+
+
+@receiver(post_save, sender=InventoryItem)
+def update_category_counters(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return  # Fixtures; run reconcile_category_counters after loading
+    old_state = None if created else instance.__dict__.pop('_counter_state', None)
+    apply_item_changes([(old_state, get_counter_state(instance))])
+
+
+@receiver(post_delete, sender=InventoryItem)
+def remove_from_category_counters(sender, instance, **kwargs):
+    if instance.deleted_at is not None:
+        return  # Taken off the counters when it was soft-deleted
+    apply_item_changes([(get_counter_state(instance), None)])
+
+
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_delete, sender=InventoryItem)
+def forget_cached_item_codes(sender, instance, **kwargs):
+    item_code_cache.forget_items([instance.pk])
+
+
+@receiver(post_save, sender=InventoryItem)
+def update_autocomplete_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        autocomplete_index.item_saved(instance)
+
+
+@receiver(post_delete, sender=InventoryItem)
+def remove_from_autocomplete_index(sender, instance, **kwargs):
+    autocomplete_index.items_deleted([(instance.owner_id, instance.pk)])
+
+
+@receiver(post_delete, sender=InventoryItem)
+def create_item_tombstone(sender, instance, origin=None, **kwargs):
+    if instance.deleted_at is not None:
+        return  # Tombstoned when it was soft-deleted
+    # Deleting the owner removes their whole sync scope, tombstones included
+    origin_model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    if origin_model is CustomUser:
+        return
+    InventoryItemTombstone.objects.create(item_id=instance.pk, owner_id=instance.owner_id)
+
+
+@receiver(pre_delete, sender=Category)
+def touch_category_items(sender, instance, **kwargs):
+    # The category is about to be cleared on these items by SET_NULL, which does not
+    # touch last_updated; bump it so the sync API sends the items again.
+    instance.inventory_items.update(last_updated=timezone.now(), version=models.F('version') + 1)
@@ -0,0 +1,133 @@
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+
+# Profile files are named "<time_ns>-<mode>-<path slug>.<ext>" so that sorting
+# by name is sorting by age, which is all the ring buffer needs.
+PROFILE_NAME_RE = re.compile(r'^\d+-(cprofile|sample)-[\w.-]*\.(prof|folded)$')
+PROFILE_EXTENSIONS = {'cprofile': 'prof', 'sample': 'folded'}
+
+
+def get_profile_dir() -> Path:
+    return Path(getattr(settings, 'PROFILING_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+def list_profiles():
+    """Return the stored profiles, newest first."""
+    directory = get_profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not PROFILE_NAME_RE.match(name):
+            continue
+        try:
+            stat = (directory / name).stat()
+        except FileNotFoundError:
+            continue  # Pruned by another worker while we were listing
+        profiles.append({'name': name, 'size': stat.st_size, 'created': stat.st_mtime})
+    return profiles
+
+
+def get_profile_path(name):
+    # Only names produced by this module are served, which also rules out path traversal.
+    if not PROFILE_NAME_RE.match(name):
+        return None
+    path = get_profile_dir() / name
+    return path if path.is_file() else None
+
+
+def new_profile_path(mode, request_path) -> Path:
+    directory = get_profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r'[^\w.-]+', '_', request_path.strip('/'))[:80] or 'root'
+    return directory / f"{time.time_ns()}-{mode}-{slug}.{PROFILE_EXTENSIONS[mode]}"
+
+
+def _prune_profiles():
+    # Keep the buffer bounded; the oldest files go first.
+    limit = getattr(settings, 'PROFILING_MAX_FILES', 50)
+    directory = get_profile_dir()
+    names = sorted(name for name in os.listdir(directory) if PROFILE_NAME_RE.match(name))
+    for name in names[:max(len(names) - limit, 0)]:
+        try:
+            os.remove(directory / name)
+        except FileNotFoundError:
+            pass
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread at a fixed interval and records folded stacks."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w') as fh:
+            for stack, count in self.samples.most_common():
+                fh.write(f"{stack} {count}\n")
+
+
+def start_profiler(mode):
+    """Start profiling the current thread; pass the result to stop_profiler()."""
+    if mode == 'sample':
+        profiler = SamplingProfiler(threading.get_ident(), getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.005))
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def stop_profiler(profiler, path):
+    """Stop a profiler started by start_profiler() and store what it recorded at ``path``."""
+    if isinstance(profiler, SamplingProfiler):
+        profiler.stop()
+        profiler.dump(path)
+    else:
+        profiler.disable()
+        profiler.dump_stats(path)
+    _prune_profiles()
+
+
+def run_profiled(mode, request_path, func, *args):
+    """Run ``func(*args)`` under the requested profiler and store the result.
+
+    Returns ``(result, profile_name)``.
+    """
+    path = new_profile_path(mode, request_path)
+    profiler = start_profiler(mode)
+    try:
+        result = func(*args)
+    finally:
+        stop_profiler(profiler, path)
+    return result, path.name
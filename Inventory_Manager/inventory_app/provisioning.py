@@ -0,0 +1,99 @@
+import csv
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .serializers import UserProvisionSerializer
+
+User = get_user_model()
+
+LOOKUP_CHUNK_SIZE = 1000
+
+
+# Bulk creation of user accounts from CSV (header: email, username, first_name, last_name and
+# an optional password column; rows without a password get an unusable one). Every row is
+# validated first and nothing is created if any row is invalid. Hashing, the expensive part,
+# is spread over a process pool and the users are inserted with bulk_create. Uploads over HTTP
+# are validated in the request and created by a `provision_users` job (jobs.py).
+def read_user_csv(file):
+    """Rows of a provisioning CSV from a text file object, as dicts with their line numbers."""
+    reader = csv.DictReader(file)
+    try:
+        missing = set(UserProvisionSerializer.REQUIRED_COLUMNS) - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"Missing CSV columns: {', '.join(sorted(missing))}.")
+        return [(reader.line_num, row) for row in reader]
+    except csv.Error as exc:
+        raise ValueError(f"Invalid CSV on line {reader.line_num}: {exc}")
+
+
+def validate_rows(rows):
+    """Return (valid rows, errors); errors are {'line': n, 'errors': {...}} dicts."""
+    valid, errors = [], []
+    seen_emails, seen_usernames = {}, {}
+    for line, row in rows:
+        serializer = UserProvisionSerializer(data=row)
+        if not serializer.is_valid():
+            errors.append({'line': line, 'errors': serializer.errors})
+            continue
+        data = serializer.validated_data
+        row_errors = {}
+        if data['email'].lower() in seen_emails:
+            row_errors['email'] = [f"Duplicate of line {seen_emails[data['email'].lower()]}."]
+        if data['username'] in seen_usernames:
+            row_errors['username'] = [f"Duplicate of line {seen_usernames[data['username']]}."]
+        if row_errors:
+            errors.append({'line': line, 'errors': row_errors})
+            continue
+        seen_emails[data['email'].lower()] = seen_usernames[data['username']] = line
+        valid.append((line, data))
+
+    # Accounts that already exist, looked up in chunks instead of one query per row
+    existing_emails, existing_usernames = set(), set()
+    for start in range(0, len(valid), LOOKUP_CHUNK_SIZE):
+        chunk = [data for _, data in valid[start:start + LOOKUP_CHUNK_SIZE]]
+        existing_emails.update(email.lower() for email in User.objects.filter(email__in=[data['email'] for data in chunk]).values_list('email', flat=True))
+        existing_usernames.update(User.objects.filter(username__in=[data['username'] for data in chunk]).values_list('username', flat=True))
+    for line, data in valid:
+        row_errors = {}
+        if data['email'].lower() in existing_emails:
+            row_errors['email'] = ["A user with this email already exists."]
+        if data['username'] in existing_usernames:
+            row_errors['username'] = ["A user with this username already exists."]
+        if row_errors:
+            errors.append({'line': line, 'errors': row_errors})
+
+    errors.sort(key=lambda error: error['line'])
+    return [data for _, data in valid], errors
+
+
+def hash_passwords(passwords, workers=None):
+    """make_password() for each password (None gives an unusable password), in a process pool."""
+    workers = workers or settings.PROVISION_HASH_WORKERS or os.cpu_count() or 1
+    to_hash = sum(1 for password in passwords if password is not None)
+    if workers <= 1 or to_hash < 2 * workers:
+        return [make_password(password) for password in passwords]
+    # Spawned rather than forked: the caller may be a threaded job worker, and a forked child
+    # could inherit a lock another thread was holding.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup) as pool:
+        return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def provision_users(rows, workers=None, dry_run=False, progress=None):
+    """Validate the rows and create their users. Returns (number created, errors)."""
+    valid, errors = validate_rows(rows)
+    if errors or dry_run:
+        return 0, errors
+    if progress:
+        progress(f"Hashing {len(valid)} passwords")
+    passwords = hash_passwords([data.pop('password', None) or None for data in valid], workers)
+    users = [User(password=password, **data) for data, password in zip(valid, passwords)]
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=settings.PROVISION_BATCH_SIZE)
+    return len(users), []
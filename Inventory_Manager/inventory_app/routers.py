@@ -0,0 +1,155 @@
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+# Per-request routing state, set by ReplicaRoutingMiddleware. Outside a request
+# (shell, management commands) reads go to the primary unless wrapped in replica_reads().
+_routing_state = ContextVar('replica_routing_state', default=None)
+
+# Replicas that failed a connection attempt, mapped to when they may be retried.
+_unavailable_until = {}
+
+
+class RoutingState:
+    def __init__(self, use_replica, request=None):
+        self.use_replica = use_replica
+        self.request = request
+        self.pinned = None  # Resolved lazily, once the request user is known
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+def get_pin_cache():
+    # Shared between worker processes; the per-process default cache would lose the pin
+    # whenever the next request lands on another worker.
+    return caches[getattr(settings, 'REPLICA_PIN_CACHE', DEFAULT_CACHE_ALIAS)]
+
+
+def pin_to_primary(user):
+    # Reads from this user go to the primary until the replicas have caught up.
+    get_pin_cache().set(pin_key(user.pk), True, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def is_pinned(user):
+    return bool(user and user.is_authenticated and get_pin_cache().get(pin_key(user.pk)))
+
+
+def resolve_pin(user):
+    """Look up ``user``'s pin for the current request ahead of its queries.
+
+    Async views call this from sync code once they know the user: the pin cache may be a
+    database table, which the router cannot query from the event loop.
+    """
+    state = _routing_state.get()
+    if state is not None and state.use_replica and state.pinned is None and user.is_authenticated:
+        state.pinned = False  # Guards against re-entry from cache backends that query
+        state.pinned = is_pinned(user)
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+@contextmanager
+def replica_reads():
+    """Send reads inside the block to a replica (reporting queries, exports)."""
+    token = _routing_state.set(RoutingState(use_replica=True))
+    try:
+        yield
+    finally:
+        _routing_state.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Force reads inside the block to the primary."""
+    token = _routing_state.set(RoutingState(use_replica=False))
+    try:
+        yield
+    finally:
+        _routing_state.reset(token)
+
+
+def _replica_available(alias):
+    retry_at = _unavailable_until.get(alias)
+    if retry_at is not None and retry_at > time.monotonic():
+        return False
+    if _in_event_loop():
+        return True  # Connecting is sync-only; async queries connect from a worker thread later
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        _unavailable_until[alias] = time.monotonic() + getattr(settings, 'REPLICA_RETRY_SECONDS', 30)
+        return False
+    _unavailable_until.pop(alias, None)
+    return True
+
+
+class ReplicaRouter:
+    """Route reads to a replica for safe requests; everything else uses the primary."""
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Follow the database the related object was loaded from.
+            return instance._state.db
+
+        if model._meta.app_label == 'django_cache':
+            return DEFAULT_DB_ALIAS  # The database cache holding the pins; a lagging replica would miss them
+
+        state = _routing_state.get()
+        if state is None or not state.use_replica:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        if state.pinned is None and state.request is not None:
+            # DRF copies the authenticated user onto the Django request, so by the time
+            # a view queries the database we know who is asking. A session user that has
+            # not been loaded yet is being loaded by this very query; decide on the next one.
+            user = getattr(state.request, 'user', None)
+            if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+                user = None
+            if user is not None and user.is_authenticated:
+                if _in_event_loop():
+                    return DEFAULT_DB_ALIAS  # Cannot look the pin up here; see resolve_pin()
+                resolve_pin(user)
+        if state.pinned:
+            return DEFAULT_DB_ALIAS
+
+        replicas = get_replicas()
+        random.shuffle(replicas)
+        for alias in replicas:
+            if _replica_available(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication.
+        return db not in get_replicas()
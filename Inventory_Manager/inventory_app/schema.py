@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
+from django.template.loader import render_to_string
+from django.urls import reverse
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.renderers import ReDocRenderer, SwaggerUIRenderer
+
+API_INFO = openapi.Info(
+    title="INVENTORY MANAGEMENT API",
+    default_version='v1',
+    description="Test description",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="elijahosas@gmail.com"),
+    license=openapi.License(name="BSD License"),
+)
+
+# Prebuilt schemas are named "openapi-<api version>-<content hash>.json", so a name never
+# changes meaning and the file can be cached forever. MANIFEST_NAME points at the current one.
+SCHEMA_NAME_RE = re.compile(r'^openapi-[\w.]+-[0-9a-f]{16}\.json$')
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def get_schema_dir() -> Path:
+    return Path(getattr(settings, 'OPENAPI_SCHEMA_DIR', Path(settings.BASE_DIR) / 'openapi'))
+
+
+def build_schema(keep=3):
+    """Generate the schema with drf_yasg, store it under a content-hashed name and make it current."""
+    schema = OpenAPISchemaGenerator(API_INFO).get_schema(request=None, public=True)
+    content = OpenAPICodecJson(validators=[]).encode(schema)
+    name = f"openapi-{schema.info.version}-{hashlib.sha256(content).hexdigest()[:16]}.json"
+
+    directory = get_schema_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    _write_atomic(directory / name, content)
+    _write_atomic(directory / MANIFEST_NAME, json.dumps({'current': name}).encode())
+
+    # Keep a few older versions for pages that were loaded before the deploy
+    names = sorted((path for path in directory.iterdir() if SCHEMA_NAME_RE.match(path.name) and path.name != name), key=os.path.getmtime)
+    for path in names[:max(len(names) - keep, 0)]:
+        path.unlink(missing_ok=True)
+    return name
+
+
+def _write_atomic(path, content):
+    temporary = path.with_suffix('.tmp')
+    temporary.write_bytes(content)
+    os.replace(temporary, path)
+
+
+def get_current_schema_name():
+    try:
+        name = json.loads((get_schema_dir() / MANIFEST_NAME).read_text())['current']
+    except (OSError, ValueError, KeyError):
+        return None
+    return name if SCHEMA_NAME_RE.match(name) else None
+
+
+def prebuilt_schema(request, name):
+    # Only names produced by build_schema are served, which also rules out path traversal.
+    path = get_schema_dir() / name
+    if not SCHEMA_NAME_RE.match(name) or not path.is_file():
+        raise Http404("Schema not found.")
+    response = FileResponse(open(path, 'rb'), content_type='application/json')
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def _current_schema_url():
+    name = get_current_schema_name()
+    if name is None:
+        raise Http404("No prebuilt schema. Run `python manage.py build_openapi_schema`.")
+    return reverse('openapi-schema', args=[name])
+
+
+def current_schema(request):
+    # Stable URL for tools; redirects to the immutable file of the current build.
+    response = HttpResponseRedirect(_current_schema_url())
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+class PrebuiltSwaggerUIRenderer(SwaggerUIRenderer):
+    spec_url = None
+
+    def get_swagger_ui_settings(self):
+        return {**super().get_swagger_ui_settings(), 'url': self.spec_url}
+
+
+class PrebuiltReDocRenderer(ReDocRenderer):
+    spec_url = None
+
+    def get_redoc_settings(self):
+        return {**super().get_redoc_settings(), 'url': self.spec_url}
+
+
+def schema_ui(request, renderer_class):
+    """Swagger UI / ReDoc page pointing at the prebuilt schema instead of generating one."""
+    renderer = renderer_class()
+    renderer.spec_url = _current_schema_url()
+    context = {'request': request}
+    renderer.set_context(context)
+    context['title'] = API_INFO.title
+    response = HttpResponse(render_to_string(renderer.template, context, request))
+    response['Cache-Control'] = 'no-cache'  # The page is tiny; the schema it loads is cached
+    return response
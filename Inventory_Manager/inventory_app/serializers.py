@@ -1,9 +1,44 @@
+from copy import copy
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Category, InventoryItem, InventoryChangeLog
+from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Category, InventoryItem, InventoryChangeLog, InventoryForecast, Job, get_item_changes
+from .exceptions import PreconditionFailed
+from .bulk import OPERATIONS, PRICE_PERCENT, THRESHOLD, CATEGORY
+from .counters import apply_item_changes, get_counter_state
+from .media import get_signed_media_url
+from .codes import item_code_cache, normalize_code
+from .autocomplete import autocomplete_index
+from .batch import FORWARDED_HEADERS, resolve_view
+from .jobs import PRIVATE_ARGS_TASKS, TASKS, check_task_args, enqueue
 
 User = get_user_model()
 
+# Files are returned as signed, expiring URLs of the protected media view (see media.py).
+# Only the owner of the object (its ``owner_attr``) and staff get a URL; anyone else sees null.
+class SignedImageField(serializers.ImageField):
+    def __init__(self, owner_attr='owner_id', **kwargs):
+        self.owner_attr = owner_attr
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return None
+        if not user.is_staff and getattr(value.instance, self.owner_attr) != user.pk:
+            return None
+        return request.build_absolute_uri(get_signed_media_url(value.name, user))
+
+
 # Custom User Registration Serializer
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
@@ -13,22 +48,43 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'password']
 
     def create(self, validated_data):
-        user = User.objects.create_user(
+        # create_user() hashes the password once with the first of PASSWORD_HASHERS
+        return User.objects.create_user(
             username=validated_data['username'],
             email=validated_data['email'],
             first_name=validated_data['first_name'],
             last_name=validated_data['last_name'],
             password=validated_data['password']
         )
-        user.set_password(validated_data['password'])
-        user.save()
-        return user
-    
-    
+
+
+# One row of a user provisioning CSV (see provisioning.py)
+class UserProvisionSerializer(serializers.ModelSerializer):
+    REQUIRED_COLUMNS = ['email', 'username', 'first_name', 'last_name']
+    password = serializers.CharField(required=False, allow_blank=True, trim_whitespace=False)
+
+    class Meta:
+        model = User
+        fields = ['email', 'username', 'first_name', 'last_name', 'password']
+        # Uniqueness is checked for the whole file at once by provisioning.validate_rows
+        extra_kwargs = {'email': {'validators': []}, 'username': {'validators': [UnicodeUsernameValidator()]}}
+
+    def validate_email(self, value):
+        return User.objects.normalize_email(value)
+
+    def validate_password(self, value):
+        if value:
+            try:
+                validate_password(value)
+            except DjangoValidationError as exc:
+                raise serializers.ValidationError(list(exc.messages))
+        return value
+
 
 # Custom User Serializer
 class UserSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(required=True)
+    profile_picture = SignedImageField(owner_attr='pk', required=False, allow_null=True)
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'profile_picture']
@@ -38,8 +94,8 @@ class UserSerializer(serializers.ModelSerializer):
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'category', 'cat_description']
-        read_only_fields = ['id']
+        fields = ['id', 'category', 'cat_description', 'item_count', 'total_quantity', 'total_value']
+        read_only_fields = ['id', 'item_count', 'total_quantity', 'total_value']
      
     # Validate the category name    
     def validate(self, data):
@@ -57,15 +113,27 @@ class InventoryItemSerializer(serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
     owner_id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), write_only=True, source='owner')
     formatted_price = serializers.SerializerMethodField()
+    item_image = SignedImageField(required=False, allow_null=True)
+    # Relative stock change applied server-side, so the client never sends a stale quantity
+    item_qty_delta = serializers.IntegerField(write_only=True, required=False)
+
+    # Fields written by update(); anything else in validated_data is ignored there
+    UPDATABLE_FIELDS = ['item_name', 'sku', 'item_description', 'item_qty', 'item_price', 'low_stock_threshold', 'category', 'item_image']
+
     class Meta:
         model = InventoryItem
-        fields = ['id', 'item_name', 'item_description', 'item_qty', 'formatted_price', 'category', 'category_id', 'date_added', 'last_updated','low_stock_threshold', 'owner', 'owner_id', 'item_image']
-        read_only_fields = ['id', 'date_added', 'last_updated', 'owner']
+        fields = ['id', 'item_name', 'sku', 'item_description', 'item_qty', 'item_qty_delta', 'item_price', 'formatted_price', 'category', 'category_id', 'date_added', 'last_updated','low_stock_threshold', 'owner', 'owner_id', 'item_image', 'version']
+        read_only_fields = ['id', 'date_added', 'last_updated', 'owner', 'version']
+        validators = []  # The item is always saved for the requesting user, so SKU uniqueness is checked in validate()
     
     def get_formatted_price(self, obj):
         return "N{:,.2f}".format(obj.item_price)
 
+    def validate_sku(self, value):
+        return normalize_code(value)
+
     def create(self, validated_data):
+        validated_data.pop('item_qty_delta', None)
         validated_data['owner'] = self.context['request'].user  # Automatically set the owner
         return super().create(validated_data)
 
@@ -78,20 +146,92 @@ class InventoryItemSerializer(serializers.ModelSerializer):
         
         if item_price < 0:
             raise serializers.ValidationError("Item Price cannot be less than 0.")
+
+        if 'item_qty_delta' in data:
+            if self.instance is None:
+                raise serializers.ValidationError("item_qty_delta can only be used when updating an item.")
+            if 'item_qty' in data:
+                raise serializers.ValidationError("Send either item_qty or item_qty_delta, not both.")
+
+        if data.get('sku'):
+            owner_id = self.instance.owner_id if self.instance else self.context['request'].user.pk
+            duplicates = InventoryItem.objects.filter(owner_id=owner_id, sku=data['sku'])
+            if self.instance:
+                duplicates = duplicates.exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise serializers.ValidationError({'sku': ["Another of your items already has this SKU."]})
         return data
     
-    # Update method to handle partial updates
+    # Update method to handle partial updates.
+    # The row is written with a conditional UPDATE ... WHERE version = n instead of a
+    # read-modify-write, so a concurrent change makes this update fail with 412 rather
+    # than being silently overwritten. Pass expected_version (from If-Match) to save();
+    # without it the version this instance was loaded with is used.
     def update(self, instance, validated_data):
-        instance.item_name = validated_data.get('item_name', instance.item_name)
-        instance.item_description = validated_data.get('item_description', instance.item_description)
-        instance.item_qty = validated_data.get('item_qty', instance.item_qty)
-        instance.item_price = validated_data.get('item_price', instance.item_price)
-        instance.low_stock_threshold = validated_data.get('low_stock_threshold', instance.low_stock_threshold)
-        instance.category = validated_data.get('category', instance.category)
-        instance.item_image = validated_data.get('item_image', instance.item_image)
-        instance.save()
+        expected_version = validated_data.pop('expected_version', None)
+        qty_delta = validated_data.pop('item_qty_delta', None)
+        values = {name: validated_data[name] for name in self.UPDATABLE_FIELDS if name in validated_data}
+
+        if not qty_delta and all(getattr(instance, name) == value for name, value in values.items()):
+            # Nothing to change: no write and no new version, but a stale If-Match still fails
+            if expected_version is not None and not InventoryItem.objects.filter(pk=instance.pk, version=expected_version).exists():
+                raise PreconditionFailed()
+            return instance
+
+        if values.get('item_image') is not None:
+            # Store the upload the same way Model.save() would before writing its name
+            instance.item_image = values['item_image']
+            values['item_image'] = InventoryItem._meta.get_field('item_image').pre_save(instance, add=False)
+
+        filters = {'pk': instance.pk}
+        if expected_version is None and values:
+            expected_version = instance.version  # Absolute values are only safe against the row we read
+        if expected_version is not None:
+            filters['version'] = expected_version
+        if qty_delta:
+            values['item_qty'] = F('item_qty') + qty_delta
+            if qty_delta < 0:
+                filters['item_qty__gte'] = -qty_delta
+        values.update(version=F('version') + 1, last_updated=timezone.now())
+
+        with transaction.atomic():
+            if not InventoryItem.objects.filter(**filters).update(**values):
+                current = InventoryItem.objects.filter(pk=instance.pk).values('version').first()
+                if current is None or (expected_version is not None and current['version'] != expected_version):
+                    raise PreconditionFailed()
+                raise serializers.ValidationError({'item_qty_delta': ["Change amount would result in negative inventory."]})
+            previous = copy(instance)
+            instance.refresh_from_db()
+            if expected_version is None:
+                # Only the delta was applied; the rest of the row may have moved since it was read
+                previous.item_qty = instance.item_qty - (qty_delta or 0)
+                changes = get_item_changes(previous, instance, ['item_qty'])
+                old_state = (instance.category_id, previous.item_qty, instance.item_price)
+            else:
+                changes = get_item_changes(previous, instance)
+                old_state = get_counter_state(previous)
+            self._log_changes(previous, instance, changes)
+            apply_item_changes([(old_state, get_counter_state(instance))])
+            item_code_cache.forget_items([instance.pk])
+            autocomplete_index.item_saved(instance)
         return instance
 
+    def _log_changes(self, previous, instance, changes):
+        if not changes:
+            return
+        change_quantity = instance.item_qty - previous.item_qty
+        change_price = instance.item_price - previous.item_price if instance.item_price != previous.item_price else None
+        request = self.context['request']
+        InventoryChangeLog.objects.create(
+            inventory_item=instance,
+            # The log requires a quantity or price; other edits record a zero quantity change
+            change_quantity=change_quantity if change_quantity != 0 or change_price is None else None,
+            change_price=change_price,
+            reason=request.data.get('reason', 'No reason provided'),
+            changed_by=request.user,
+            change_details=changes
+        )
+
 # Inventory Change Log Serializer
 class InventoryChangeLogSerializer(serializers.ModelSerializer):
     inventory_item = InventoryItemSerializer(read_only=True)
@@ -101,8 +241,8 @@ class InventoryChangeLogSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = InventoryChangeLog
-        fields = ['id', 'inventory_item', 'inventory_item_id', 'change_quantity', 'change_price', 'reason', 'date_changed', 'changed_by']
-        read_only_fields = ['id', 'date_changed', 'changed_by']
+        fields = ['id', 'inventory_item', 'inventory_item_id', 'change_quantity', 'change_price', 'reason', 'date_changed', 'changed_by', 'change_details']
+        read_only_fields = ['id', 'date_changed', 'changed_by', 'change_details']
 
     # Validate the change in quantity or price
     def validate(self, data):
@@ -120,3 +260,112 @@ class InventoryChangeLogSerializer(serializers.ModelSerializer):
     
 
 
+# Item ids for the multi-get endpoints
+class InventoryItemIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=settings.MULTI_GET_MAX_IDS)
+
+
+# Scanned SKUs/barcodes for /api/inventory/by-code/
+class InventoryItemCodesSerializer(serializers.Serializer):
+    codes = serializers.ListField(child=serializers.CharField(max_length=64), allow_empty=False, max_length=settings.MULTI_GET_MAX_IDS)
+
+    def validate_codes(self, value):
+        return list(dict.fromkeys(code for code in map(normalize_code, value) if code))  # In scan order, without repeats
+
+
+# Bulk item update serializer (price, threshold or category over a list of item ids)
+class InventoryBulkUpdateSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=10000)
+    operation = serializers.ChoiceField(choices=OPERATIONS)
+    value = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)  # Percent, amount or threshold
+    category_id = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), required=False, allow_null=True, source='category')
+    reason = serializers.CharField(max_length=255, required=False, default='Bulk update')
+
+    def validate(self, data):
+        operation = data['operation']
+        value = data.get('value')
+        if operation == CATEGORY:
+            if 'category' not in data:
+                raise serializers.ValidationError({'category_id': "A category is required for this operation."})
+            data['value'] = data.pop('category')
+            return data
+        if value is None:
+            raise serializers.ValidationError({'value': "A value is required for this operation."})
+        if operation == PRICE_PERCENT and value <= -100:
+            raise serializers.ValidationError({'value': "A percentage change must be greater than -100."})
+        if operation == THRESHOLD and (value < 0 or value != int(value)):
+            raise serializers.ValidationError({'value': "The threshold must be a whole number of at least 0."})
+        return data
+
+
+# Inventory Forecast Serializer
+class InventoryForecastSerializer(serializers.ModelSerializer):
+    item_name = serializers.CharField(source='item.item_name', read_only=True)
+    item_qty = serializers.IntegerField(source='item.item_qty', read_only=True)
+    low_stock_threshold = serializers.IntegerField(source='item.low_stock_threshold', read_only=True)
+
+    class Meta:
+        model = InventoryForecast
+        fields = ['item', 'item_name', 'item_qty', 'low_stock_threshold', 'daily_consumption', 'consumption_std',
+                  'days_until_stockout', 'suggested_threshold', 'window_days', 'computed_at']
+
+
+# Background job: staff create one with a task name and its keyword arguments
+class JobSerializer(serializers.ModelSerializer):
+    task = serializers.ChoiceField(choices=sorted(TASKS))
+    args = serializers.DictField(required=False, default=dict)
+    max_attempts = serializers.IntegerField(min_value=1, max_value=20, required=False)
+
+    class Meta:
+        model = Job
+        fields = ['id', 'task', 'args', 'status', 'run_after', 'attempts', 'max_attempts', 'progress', 'progress_message',
+                  'result', 'error', 'created_by', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = ['id', 'status', 'attempts', 'progress', 'progress_message', 'result', 'error',
+                            'created_by', 'created_at', 'started_at', 'finished_at']
+        extra_kwargs = {'run_after': {'required': False}}
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.task in PRIVATE_ARGS_TASKS:
+            data['args'] = {name: '(hidden)' for name in data['args']}
+        return data
+
+    def validate(self, data):
+        try:
+            check_task_args(data['task'], data['args'])
+        except ValueError as error:
+            raise serializers.ValidationError({'args': [str(error)]})
+        return data
+
+    def create(self, validated_data):
+        return enqueue(
+            validated_data['task'],
+            validated_data['args'],
+            created_by=validated_data.get('created_by'),
+            run_after=validated_data.get('run_after'),
+            max_attempts=validated_data.get('max_attempts'),
+        )
+
+
+# One sub-request of /api/batch/
+class BatchSubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+    path = serializers.CharField(max_length=2000)  # e.g. "/api/inventory/?ids=1,2"
+    body = serializers.JSONField(required=False)
+    headers = serializers.DictField(child=serializers.CharField(max_length=1000), required=False, default=dict)
+
+    def validate_path(self, value):
+        if not value.startswith('/api/') or resolve_view(value) is None:
+            raise serializers.ValidationError("Not an API endpoint that can be batched.")
+        return value
+
+    def validate_headers(self, value):
+        unknown = sorted(name for name in value if name.lower() not in FORWARDED_HEADERS)
+        if unknown:
+            raise serializers.ValidationError(f"Only these headers can be set: {', '.join(FORWARDED_HEADERS)}.")
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchSubRequestSerializer(many=True, allow_empty=False, max_length=settings.BATCH_MAX_REQUESTS)
+    atomic = serializers.BooleanField(default=False)  # All-or-nothing: the first failure rolls back the batch
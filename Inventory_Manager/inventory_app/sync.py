@@ -0,0 +1,103 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .exceptions import SyncCursorExpired
+from .models import InventoryItem, InventoryItemTombstone
+
+
+# A sync cursor holds a keyset position, (timestamp, id), in each of the two change streams:
+# items ordered by last_updated and tombstones ordered by deleted_at. It never moves past
+# now - SYNC_SETTLE_SECONDS, so a write whose transaction commits late is not skipped.
+class SyncCursor:
+    def __init__(self, item_position, tombstone_position):
+        self.item_position = item_position  # (last_updated, id) or None to start from the first item
+        self.tombstone_position = tombstone_position  # (deleted_at, id)
+
+    def encode(self):
+        data = [_encode_position(self.item_position), _encode_position(self.tombstone_position)]
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+
+    @classmethod
+    def decode(cls, value):
+        try:
+            item_position, tombstone_position = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+            return cls(_decode_position(item_position), _decode_position(tombstone_position))
+        except (ValueError, TypeError):
+            raise ValidationError({'since': ['Invalid sync cursor.']})
+
+
+def _encode_position(position):
+    return None if position is None else [position[0].isoformat(), position[1]]
+
+
+def _decode_position(position):
+    if position is None:
+        return None
+    timestamp, pk = position
+    timestamp = datetime.fromisoformat(timestamp)
+    if timezone.is_naive(timestamp) or not isinstance(pk, int):
+        raise ValueError(position)
+    return timestamp, pk
+
+
+def _after(queryset, field, position, upper_bound):
+    queryset = queryset.filter(**{f'{field}__lte': upper_bound})
+    if position is not None:
+        timestamp, pk = position
+        queryset = queryset.filter(Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': pk}))
+    return queryset.order_by(field, 'id')
+
+
+def get_changes(user, since=None):
+    """Return (items, deleted item ids, next cursor, has_more) for changes after ``since``.
+
+    Without a cursor every item is returned (in batches) and only deletions from now on.
+    """
+    batch_size = settings.SYNC_BATCH_SIZE
+    upper_bound = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    if since is None:
+        cursor = SyncCursor(None, (upper_bound, 0))
+    else:
+        cursor = SyncCursor.decode(since)
+        if cursor.tombstone_position[0] < timezone.now() - settings.SYNC_TOMBSTONE_TTL:
+            raise SyncCursorExpired()
+
+    items = InventoryItem.objects.select_related('category', 'owner')
+    tombstones = InventoryItemTombstone.objects.all()
+    if not user.is_staff:
+        items = items.filter(owner=user)
+        tombstones = tombstones.filter(owner=user)
+
+    # One row past the batch from each stream tells whether more remain
+    items = list(_after(items, 'last_updated', cursor.item_position, upper_bound)[:batch_size + 1])
+    tombstones = list(_after(tombstones, 'deleted_at', cursor.tombstone_position, upper_bound)[:batch_size + 1])
+
+    # Merge both streams by timestamp and cut the batch; each stream's position advances
+    # only over the rows actually returned.
+    changes = sorted(
+        [(item.last_updated, item.pk, item) for item in items]
+        + [(tombstone.deleted_at, tombstone.pk, tombstone) for tombstone in tombstones],
+        key=lambda change: change[:2],
+    )
+    has_more = len(changes) > batch_size
+    batch = [change[2] for change in changes[:batch_size]]
+    changed_items = [obj for obj in batch if isinstance(obj, InventoryItem)]
+    deleted = [obj for obj in batch if isinstance(obj, InventoryItemTombstone)]
+    if changed_items:
+        cursor.item_position = (changed_items[-1].last_updated, changed_items[-1].pk)
+    if deleted:
+        cursor.tombstone_position = (deleted[-1].deleted_at, deleted[-1].pk)
+    if not has_more:
+        # Both streams are exhausted up to the bound: move the positions up to it, so a client
+        # that keeps syncing does not drift towards SYNC_TOMBSTONE_TTL while nothing is deleted.
+        if cursor.item_position is None or cursor.item_position[0] < upper_bound:
+            cursor.item_position = (upper_bound, 0)
+        if cursor.tombstone_position[0] < upper_bound:
+            cursor.tombstone_position = (upper_bound, 0)
+    return changed_items, [tombstone.item_id for tombstone in deleted], cursor.encode(), has_more
@@ -1,3 +1,489 @@
-from django.test import TestCase
+import asyncio
+from contextlib import ExitStack
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db import DatabaseError, connection, connections, router
+from django.http import HttpResponse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from . import jobs, routers
+from .admin import EstimatedCountPaginator
+from .counters import reconcile_category_counters
+from .deletion import purge_deleted
+from .forecasting import compute_forecasts
+from .middleware import ReplicaRoutingMiddleware
+from .models import Category, IdempotencyKey, InventoryChangeLog, InventoryForecast, InventoryItem, Job
+from .serializers import InventoryItemSerializer
+
+REPLICAS = list(settings.DATABASE_REPLICAS)
+
+# Run locally on SQLite, with or without stand-in replicas:
+#   SQLITE_REPLICAS=2 python manage.py test inventory_app
+
+
+def create_user(email, **extra):
+    return get_user_model().objects.create_user(email=email, username=email, password='password', **extra)
+
+
+def create_item(owner, **fields):
+    fields.setdefault('item_name', 'Widget')
+    fields.setdefault('item_price', Decimal('2.50'))
+    return InventoryItem.objects.create(owner=owner, **fields)
+
+
+# Base for tests going through the API; the test client speaks plain HTTP
+@override_settings(SECURE_SSL_REDIRECT=False)
+class APITests(APITestCase):
+    pass
+
+
+def run_ready_jobs(worker='test-worker'):
+    """Claim and run the ready jobs in this thread, as one pass of a worker would."""
+    # run_job() closes its connections for pool threads, which would end the test's transaction
+    with mock.patch.object(jobs.connections, 'close_all'):
+        for job_id, attempt in jobs.claim_jobs(worker, 100):
+            jobs.run_job(job_id, worker, attempt)
+
+
+# Replica routing, with SQLite databases standing in for the replicas.
+# Transactional, because the router keeps every read inside an atomic block on the primary.
+@skipUnless(len(REPLICAS) >= 2, "Set SQLITE_REPLICAS=2 (or MYSQL_REPLICA_HOSTS) to test replica routing.")
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', *REPLICAS}
+
+    def setUp(self):
+        routers._unavailable_until.clear()
+        caches[settings.REPLICA_PIN_CACHE].clear()
+        self.user = create_user('reader@example.com')
+
+    def route(self, method, user=None):
+        """The database an item read is sent to during a request."""
+        routed = []
+
+        def view(request):
+            routed.append(router.db_for_read(InventoryItem))
+            return HttpResponse()
+        request = getattr(RequestFactory(), method)('/api/inventory/')
+        request.user = user or AnonymousUser()
+        ReplicaRoutingMiddleware(view)(request)
+        return routed[0]
+
+    def break_replicas(self, stack, aliases):
+        for alias in aliases:
+            stack.enter_context(mock.patch.object(connections[alias], 'ensure_connection', side_effect=DatabaseError))
+
+    def test_safe_requests_read_from_a_replica(self):
+        self.assertIn(self.route('get', self.user), REPLICAS)
+        self.assertIn(self.route('head'), REPLICAS)
+
+    def test_unsafe_requests_and_writes_use_the_primary(self):
+        self.assertEqual(self.route('post', self.user), 'default')
+        with routers.replica_reads():
+            self.assertEqual(router.db_for_write(InventoryItem), 'default')
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(router.db_for_read(InventoryItem), 'default')
+        with routers.replica_reads():
+            self.assertIn(router.db_for_read(InventoryItem), REPLICAS)
+
+    def test_write_pins_the_user_to_the_primary(self):
+        self.route('post', self.user)
+        self.assertTrue(caches[settings.REPLICA_PIN_CACHE].get(routers.pin_key(self.user.pk)))
+        self.assertEqual(self.route('get', self.user), 'default')
+        self.assertIn(self.route('get', create_user('other@example.com')), REPLICAS)
+
+    def test_failed_write_does_not_pin(self):
+        def view(request):
+            return HttpResponse(status=400)
+        request = RequestFactory().post('/api/inventory/')
+        request.user = self.user
+        ReplicaRoutingMiddleware(view)(request)
+        self.assertIn(self.route('get', self.user), REPLICAS)
+
+    def test_async_views_look_the_pin_up_before_querying(self):
+        async def route():
+            return router.db_for_read(InventoryItem)
+        pinned = create_user('writer@example.com')
+        routers.pin_to_primary(pinned)
+        for user, expected in ((self.user, REPLICAS), (pinned, ['default'])):
+            request = RequestFactory().get('/api/async/inventory/')
+            request.user = user
+            token = routers._routing_state.set(routers.RoutingState(True, request))
+            try:
+                self.assertEqual(asyncio.run(route()), 'default')  # Unknown on the event loop, so the primary
+                routers.resolve_pin(user)
+                self.assertIn(asyncio.run(route()), expected)
+            finally:
+                routers._routing_state.reset(token)
+
+    def test_pin_is_read_from_the_primary(self):
+        with routers.replica_reads():
+            self.assertEqual(router.db_for_read(caches[settings.REPLICA_PIN_CACHE].cache_model_class), 'default')
+
+    def test_unreachable_replica_is_skipped(self):
+        broken, *working = REPLICAS
+        with ExitStack() as stack:
+            self.break_replicas(stack, [broken])
+            for _ in range(10):
+                self.assertIn(self.route('get', self.user), working)
+        self.assertIn(broken, routers._unavailable_until)
+
+    def test_falls_back_to_the_primary_without_replicas(self):
+        with ExitStack() as stack:
+            self.break_replicas(stack, REPLICAS)
+            self.assertEqual(self.route('get', self.user), 'default')
+
+
+class ForecastTests(TestCase):
+    def setUp(self):
+        self.item = create_item(create_user('owner@example.com'), item_qty=100)
+
+    def consume(self, quantity):
+        self.item.item_qty -= quantity
+        self.item.save()
+
+    def test_rerun_updates_the_forecasts_in_place(self):
+        self.consume(30)
+        compute_forecasts(window_days=10)
+        first = InventoryForecast.objects.get(item=self.item)
+        self.consume(30)
+        compute_forecasts(window_days=10)
+        self.assertEqual(InventoryForecast.objects.count(), 1)
+        second = InventoryForecast.objects.get(item=self.item)
+        self.assertEqual((first.daily_consumption, second.daily_consumption), (30, 60))
+        self.assertGreater(second.computed_at, first.computed_at)
+
+    def test_no_conflict_target_where_the_database_takes_none(self):
+        # MySQL: ON DUPLICATE KEY UPDATE, which Django refuses to combine with unique_fields
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(InventoryForecast.objects, 'bulk_create') as bulk_create:
+            compute_forecasts(window_days=10)
+        self.assertIsNone(bulk_create.call_args.kwargs['unique_fields'])
+        self.assertTrue(bulk_create.call_args.kwargs['update_conflicts'])
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000, PROVISION_HASH_WORKERS=1)
+class UserProvisionTests(APITests):
+    def setUp(self):
+        self.client.force_authenticate(create_user('staff@example.com', is_staff=True))
+
+    def upload(self, text, **params):
+        upload = SimpleUploadedFile('users.csv', text.encode(), content_type='text/csv')
+        return self.client.post('/api/users/provision/' + ('?dry_run=true' if params.get('dry_run') else ''), {'file': upload}, format='multipart')
+
+    def test_valid_file_is_created_by_a_job(self):
+        response = self.upload("email,username,first_name,last_name,password\nann@example.com,ann,Ann,Lee,Secret-pass-42\nbo@example.com,bo,Bo,Kim,\n")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['job']['args'], {'rows': '(hidden)'})
+        self.assertFalse(get_user_model().objects.filter(email='ann@example.com').exists())
+
+        run_ready_jobs()
+        job = Job.objects.get(pk=response.data['job']['id'])
+        self.assertEqual((job.status, job.result['created'], job.args), (Job.SUCCEEDED, 2, {}))
+        self.assertTrue(get_user_model().objects.get(email='ann@example.com').check_password('Secret-pass-42'))
+        self.assertFalse(get_user_model().objects.get(email='bo@example.com').has_usable_password())
+
+    def test_invalid_file_is_rejected_without_a_job(self):
+        response = self.upload("email,username,first_name,last_name\nnot-an-email,ann,Ann,Lee\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0]['line'], 2)
+        self.assertFalse(Job.objects.exists())
+
+    def test_dry_run_only_validates(self):
+        response = self.upload("email,username,first_name,last_name\nann@example.com,ann,Ann,Lee\n", dry_run=True)
+        self.assertEqual((response.status_code, response.data['valid']), (200, 1))
+        self.assertFalse(Job.objects.exists())
+
+
+class InventoryItemUpdateTests(APITests):
+    def setUp(self):
+        self.owner = create_user('owner@example.com')
+        self.item = create_item(self.owner, item_qty=10)
+        self.url = f'/api/inventory/{self.item.pk}/'
+        self.client.force_authenticate(self.owner)
+
+    def patch(self, data, **headers):
+        return self.client.patch(self.url, data, format='json', headers=headers)
+
+    def test_stale_if_match_is_rejected(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.patch({'item_qty': 12}, **{'If-Match': etag}).status_code, 200)
+        response = self.patch({'item_qty': 20}, **{'If-Match': etag})
+        self.assertEqual(response.status_code, 412)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.item_qty, self.item.version), (12, 2))
+
+    def test_concurrent_deltas_both_apply(self):
+        # Two requests that loaded the same version of the item
+        first, second = InventoryItem.objects.get(pk=self.item.pk), InventoryItem.objects.get(pk=self.item.pk)
+        for instance, delta in ((first, 5), (second, -3)):
+            request = Request(APIRequestFactory().patch(self.url, {'item_qty_delta': delta}, format='json'), parsers=[JSONParser()])
+            request.user = self.owner
+            serializer = InventoryItemSerializer(instance, data=request.data, partial=True, context={'request': request})
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.item_qty, self.item.version), (12, 3))
+
+    def test_delta_below_zero_is_rejected(self):
+        response = self.patch({'item_qty_delta': -11})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('item_qty_delta', response.data)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.item_qty, self.item.version), (10, 1))
+
+    def test_unchanged_patch_writes_nothing(self):
+        logs = InventoryChangeLog.objects.filter(inventory_item=self.item).count()
+        for data in ({}, {'item_qty_delta': 0}, {'item_name': self.item.item_name, 'item_qty': 10}):
+            response = self.patch(data, **{'If-Match': '"1"'})
+            self.assertEqual((response.status_code, response['ETag']), (200, '"1"'))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.version, 1)
+        self.assertEqual(InventoryChangeLog.objects.filter(inventory_item=self.item).count(), logs)
+        self.assertEqual(self.patch({}, **{'If-Match': '"7"'}).status_code, 412)
+
+
+class IdempotencyTests(APITests):
+    def setUp(self):
+        self.user = create_user('writer@example.com')
+        self.client.force_authenticate(self.user)
+
+    def post(self, name, key='key-1'):
+        return self.client.post('/api/categories/', {'category': name}, format='json', headers={'Idempotency-Key': key})
+
+    def test_retry_replays_the_first_response(self):
+        first, second = self.post('Tools'), self.post('Tools')
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Category.objects.filter(category='Tools').count(), 1)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.post('Tools')
+        self.assertEqual(self.post('Paint').status_code, 422)
+        self.assertFalse(Category.objects.filter(category='Paint').exists())
+
+    def test_retry_while_the_first_request_runs_conflicts(self):
+        self.post('Tools')
+        IdempotencyKey.objects.update(response_status=None, response_body=None)  # As if still running
+        self.assertEqual(self.post('Tools').status_code, 409)
+
+    def test_expired_key_runs_the_request_again(self):
+        self.post('Tools')
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        self.assertEqual(self.post('Paint').status_code, 201)
+        self.assertEqual(Category.objects.filter(category__in=['Tools', 'Paint']).count(), 2)
+
+    def test_keys_are_scoped_per_user(self):
+        self.post('Tools')
+        self.client.force_authenticate(create_user('other@example.com'))
+        response = self.post('Paint')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_anonymous_requests_ignore_the_key(self):
+        self.client.force_authenticate(None)
+        for email in ('ann@example.com', 'bo@example.com'):
+            response = self.client.post('/api/register/', {
+                'email': email, 'username': email, 'first_name': 'A', 'last_name': 'B', 'password': 'Secret-pass-42',
+            }, format='json', headers={'Idempotency-Key': 'shared'})
+            self.assertEqual(response.data['email'], email)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class BatchTests(APITests):
+    def setUp(self):
+        self.user = create_user('batcher@example.com')
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(category='Tools')
+
+    def batch(self, *requests, atomic=False):
+        return self.client.post('/api/batch/', {'requests': list(requests), 'atomic': atomic}, format='json')
+
+    def create(self, name):
+        body = {'item_name': name, 'item_qty': 5, 'item_price': '2.00', 'category_id': self.category.pk, 'owner_id': self.user.pk}
+        return {'method': 'POST', 'path': '/api/inventory/', 'body': body}
+
+    missing = {'method': 'PATCH', 'path': '/api/inventory/999999/', 'body': {'item_qty': 1}}
+
+    def test_failure_rolls_back_an_atomic_batch(self):
+        response = self.batch(self.create('Hammer'), self.missing, self.create('Saw'), atomic=True)
+        self.assertFalse(response.data['committed'])
+        self.assertEqual([r['status'] for r in response.data['responses']], [201, 404, 424])
+        self.assertFalse(InventoryItem.all_objects.exists())
+        self.assertFalse(InventoryChangeLog.objects.exists())
+        self.category.refresh_from_db()
+        self.assertEqual((self.category.item_count, self.category.total_quantity, self.category.total_value), (0, 0, 0))
+
+    def test_non_atomic_batch_keeps_the_successful_requests(self):
+        response = self.batch(self.create('Hammer'), self.missing, self.create('Saw'))
+        self.assertTrue(response.data['committed'])
+        self.assertEqual([r['status'] for r in response.data['responses']], [201, 404, 201])
+        self.assertEqual(sorted(InventoryItem.objects.values_list('item_name', flat=True)), ['Hammer', 'Saw'])
+        self.category.refresh_from_db()
+        self.assertEqual((self.category.item_count, self.category.total_quantity, self.category.total_value), (2, 10, Decimal('20.00')))
+
+    def test_only_whitelisted_headers_can_be_set(self):
+        sub_request = {**self.create('Hammer'), 'headers': {'Idempotency-Key': 'k1', 'Authorization': 'Bearer other'}}
+        response = self.batch(sub_request)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(InventoryItem.all_objects.exists())
+
+        sub_request['headers'] = {'Idempotency-Key': 'k1'}
+        self.assertEqual(self.batch(sub_request).data['responses'][0]['status'], 201)
+        replayed = self.batch(sub_request).data['responses'][0]
+        self.assertEqual(replayed['headers'].get('Idempotent-Replayed'), 'true')
+        self.assertEqual(InventoryItem.objects.count(), 1)
+
+
+@override_settings(SYNC_BATCH_SIZE=2, SYNC_SETTLE_SECONDS=0)
+class InventorySyncTests(APITests):
+    def setUp(self):
+        self.user = create_user('syncer@example.com')
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=None):
+        response = self.client.get('/api/inventory/sync/', {'since': since} if since else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_pages_through_changes_and_deletions(self):
+        cursor = self.sync()['cursor']
+        hammer, saw, drill = (create_item(self.user, item_name=name) for name in ('Hammer', 'Saw', 'Drill'))
+        self.assertEqual(self.client.delete(f'/api/inventory/{drill.pk}/').status_code, 204)
+
+        first = self.sync(cursor)
+        self.assertEqual([item['id'] for item in first['items']], [hammer.pk, saw.pk])
+        self.assertEqual(first['deleted'], [])
+        self.assertTrue(first['has_more'])
+
+        second = self.sync(first['cursor'])
+        self.assertEqual((second['items'], second['deleted'], second['has_more']), ([], [drill.pk], False))
+        self.assertEqual(self.sync(second['cursor'])['items'], [])
+
+    @override_settings(SYNC_SETTLE_SECONDS=60)
+    def test_recent_changes_are_held_back(self):
+        cursor = self.sync()['cursor']
+        create_item(self.user)
+        self.assertEqual(self.sync(cursor)['items'], [])
+
+
+class CategoryCounterTests(APITests):
+    def setUp(self):
+        self.user = create_user('counter@example.com')
+        self.client.force_authenticate(self.user)
+        self.tools, self.paint = Category.objects.create(category='Tools'), Category.objects.create(category='Paint')
+
+    def counters(self):
+        return {
+            category.category: (category.item_count, category.total_quantity, category.total_value)
+            for category in Category.objects.order_by('pk')
+        }
+
+    def test_counters_follow_every_write_path(self):
+        def create(name, qty):
+            body = {'item_name': name, 'item_qty': qty, 'item_price': '2.50', 'category_id': self.tools.pk, 'owner_id': self.user.pk}
+            response = self.client.post('/api/inventory/', body, format='json')
+            self.assertEqual(response.status_code, 201)
+            return response.data['id']
+        hammer, saw, drill, level = create('Hammer', 4), create('Saw', 2), create('Drill', 1), create('Level', 3)
+
+        self.client.patch(f'/api/inventory/{saw}/', {'category_id': self.paint.pk}, format='json')  # Category move
+        self.client.patch(f'/api/inventory/{hammer}/', {'item_qty_delta': 6}, format='json')  # Quantity change
+        self.client.delete(f'/api/inventory/{drill}/')  # Soft delete
+        InventoryItem.objects.get(pk=level).delete()  # Hard delete
+        purge_deleted(pause=0)  # Hard delete of the soft-deleted item
+
+        expected = {'Tools': (1, 10, Decimal('25.00')), 'Paint': (1, 2, Decimal('5.00'))}
+        self.assertEqual(self.counters(), expected)
+        self.assertEqual(reconcile_category_counters(), [])  # Nothing drifted
+        self.assertEqual(self.counters(), expected)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        self.user = create_user('admin@example.com')
+        create_item(self.user)
+        estimate = mock.patch.object(EstimatedCountPaginator, '_estimated_count', return_value=250000)
+        estimate.start()
+        self.addCleanup(estimate.stop)
+
+    def count(self, queryset):
+        return EstimatedCountPaginator(queryset, 100).count
+
+    def test_hiding_soft_deleted_rows_is_estimated(self):
+        self.assertEqual(self.count(InventoryItem.objects.all()), 250000)
+        self.assertEqual(self.count(InventoryItem.all_objects.all()), 250000)
+        self.assertEqual(self.count(get_user_model().objects.filter(deleted_at__isnull=True)), 250000)
+
+    def test_filtered_lists_are_counted(self):
+        self.assertEqual(self.count(InventoryItem.objects.filter(owner=self.user)), 1)
+        self.assertEqual(self.count(InventoryItem.all_objects.filter(deleted_at__isnull=False)), 0)
+        self.assertEqual(self.count(get_user_model().objects.filter(is_staff=False)), 1)
+
+
+@override_settings(JOB_RETRY_BACKOFF_SECONDS=0)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.runs = []
+        tasks = mock.patch.dict(jobs.TASKS, {'record': self.record, 'explode': self.explode})
+        tasks.start()
+        self.addCleanup(tasks.stop)
+
+    def record(self, progress, n):
+        self.runs.append(n)
+        return {'n': n}
+
+    def explode(self, progress):
+        self.runs.append('explode')
+        raise RuntimeError("boom")
+
+    def run_claimed(self, claimed, worker):
+        with mock.patch.object(jobs.connections, 'close_all'):
+            for job_id, attempt in claimed:
+                jobs.run_job(job_id, worker, attempt)
+
+    def test_two_workers_run_each_job_once(self):
+        for n in range(4):
+            jobs.enqueue('record', {'n': n})
+        first = jobs.claim_jobs('worker-a', 2)
+        second = jobs.claim_jobs('worker-b', 10)
+        self.assertEqual((len(first), len(second)), (2, 2))
+        self.assertFalse({pk for pk, _ in first} & {pk for pk, _ in second})
+        self.assertEqual(jobs.claim_jobs('worker-c', 10), [])
+
+        self.run_claimed(first, 'worker-b')  # Not this worker's claim: nothing runs
+        self.assertEqual(self.runs, [])
+        self.run_claimed(first, 'worker-a')
+        self.run_claimed(second, 'worker-b')
+        run_ready_jobs()
+        self.assertEqual(sorted(self.runs), [0, 1, 2, 3])
+        self.assertEqual(set(Job.objects.values_list('status', 'attempts')), {(Job.SUCCEEDED, 1)})
+
+    def test_failing_job_is_retried_then_failed(self):
+        job = jobs.enqueue('explode', max_attempts=3)
+        with self.assertLogs(jobs.logger, 'ERROR'):
+            run_ready_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertIn("boom", job.error)
+
+        with self.assertLogs(jobs.logger, 'ERROR') as logs:
+            for _ in range(3):
+                run_ready_jobs()  # The last pass finds nothing left to run
+        self.assertEqual(len(logs.records), 2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 3))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(self.runs, ['explode'] * 3)
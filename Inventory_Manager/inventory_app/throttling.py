@@ -0,0 +1,102 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """'600/min' -> (capacity, tokens refilled per second, period in seconds)."""
+    if rate is None:
+        return None
+    count, period = rate.split('/')
+    seconds = PERIODS[period]
+    return int(count), int(count) / seconds, seconds
+
+
+class LocalBuckets:
+    """Token buckets kept in this process, bounded to the most recently used keys."""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate, cost, period):
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (capacity, None))
+            tokens, allowed = _take(tokens, updated, capacity, refill_rate, cost)
+            self.buckets[key] = (tokens, time.monotonic())
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class CacheBuckets:
+    """Token buckets kept in the Django cache so every worker shares them.
+
+    Reads and writes are not atomic, so a burst split across workers can slightly
+    overshoot the limit; that is the price of not needing a lock server.
+    """
+
+    def consume(self, key, capacity, refill_rate, cost, period):
+        tokens, updated = cache.get(key, (capacity, None))
+        # time.time() rather than monotonic: the timestamp is shared between processes
+        tokens, allowed = _take(tokens, updated, capacity, refill_rate, cost, now=time.time())
+        cache.set(key, (tokens, time.time()), timeout=period)
+        return allowed, tokens
+
+
+def _take(tokens, updated, capacity, refill_rate, cost, now=None):
+    if updated is not None:
+        now = time.monotonic() if now is None else now
+        tokens = min(capacity, tokens + (now - updated) * refill_rate)
+    if tokens >= cost:
+        return tokens - cost, True
+    return tokens, False
+
+
+_local_buckets = LocalBuckets()
+
+
+# Token-bucket throttle configured through TOKEN_BUCKET_RATES. Views pick their
+# bucket with `throttle_scope` and how many tokens a request costs with `throttle_cost`;
+# each scope sets a rate per user class (anon, user, staff). A rate of None means unlimited.
+class TokenBucketThrottle(BaseThrottle):
+
+    def allow_request(self, request, view):
+        rates = settings.TOKEN_BUCKET_RATES
+        scope = getattr(view, 'throttle_scope', None)
+        if scope not in rates:
+            scope = 'default'
+        user = request.user
+        if user and user.is_authenticated:
+            user_class, ident = ('staff' if user.is_staff else 'user'), user.pk
+        else:
+            user_class, ident = 'anon', self.get_ident(request)
+
+        rate = parse_rate(rates[scope].get(user_class))
+        if rate is None:
+            return True
+        capacity, refill_rate, period = rate
+        self.cost = getattr(view, 'throttle_cost', 1)
+        self.refill_rate = refill_rate
+
+        store = CacheBuckets() if getattr(settings, 'TOKEN_BUCKET_SHARED_CACHE', False) else _local_buckets
+        allowed, self.tokens = store.consume(f"throttle:{scope}:{user_class}:{ident}", capacity, refill_rate, self.cost, period)
+
+        # Picked up by RateLimitHeadersMiddleware
+        request._request.rate_limit = {
+            'limit': capacity,
+            'remaining': int(self.tokens),
+            'reset': math.ceil((capacity - self.tokens) / refill_rate),
+        }
+        return allowed
+
+    def wait(self):
+        return max((self.cost - self.tokens) / self.refill_rate, 0)
@@ -9,7 +9,15 @@ from .views import (
     CategoryListCreateView, CategoryDetailView,
     InventoryItemListCreateView, InventoryItemDetailView, InventoryLevelListView,
     InventoryChangeLogListView, ApiRootViewAuthenticated, InventoryChangeLogDetailView, 
-    LowStockItemsView
+    LowStockItemsView, ProfileListView, ProfileDownloadView, InventoryBulkUpdateView, InventorySyncView,
+    InventoryFacetsView, UserProvisionView, InventoryForecastListView, InventoryItemMultiGetView,
+    BatchView, InventoryItemByCodeView, InventoryItemByCodesView, JobListCreateView, JobDetailView,
+    InventoryAutocompleteView
+)
+from .async_views import (
+    AsyncCategoryListView, AsyncCategoryDetailView,
+    AsyncInventoryItemListView, AsyncInventoryItemDetailView, AsyncLowStockItemsView,
+    AsyncInventoryChangeLogListView, AsyncInventoryChangeLogDetailView, AsyncChangeFeedView
 )
 
 urlpatterns = [
@@ -22,6 +30,7 @@ urlpatterns = [
 
     # User Management
     path('users/', UserListCreateView.as_view(), name='user_list_create'),  # List all users or create a new user
+    path('users/provision/', UserProvisionView.as_view(), name='user_provision'),  # Create many users from a CSV upload (staff only)
     path('users/<int:pk>/', UserDetailView.as_view(), name='user_detail'),  # Retrieve, Update, or Delete a user
     path('user/', UserProfileView.as_view(), name='user_profile'),  # Retrieve the currently logged-in user's profile
 
@@ -31,14 +40,43 @@ urlpatterns = [
 
     # Inventory Item Management
     path('inventory/', InventoryItemListCreateView.as_view(), name='inventory_list_create'),  # List all inventory items or create a new inventory item
+    path('inventory/multi-get/', InventoryItemMultiGetView.as_view(), name='inventory_multi_get'),  # Many items by id; POST {"ids": [...]} for long lists
+    path('inventory/by-code/', InventoryItemByCodesView.as_view(), name='inventory_by_codes'),  # Many items by SKU/barcode; POST {"codes": [...]}
+    path('inventory/by-code/<str:code>/', InventoryItemByCodeView.as_view(), name='inventory_by_code'),  # One item by SKU/barcode
+    path('inventory/autocomplete/', InventoryAutocompleteView.as_view(), name='inventory_autocomplete'),  # Typeahead suggestions, ?q=<prefix>
     path('inventory/<int:pk>/', InventoryItemDetailView.as_view(), name='inventory_detail'),  # Retrieve, Update, or Delete an inventory item
     path('inventory-levels/', InventoryLevelListView.as_view(), name='inventory_levels'),
+    path('inventory-levels/facets/', InventoryFacetsView.as_view(), name='inventory_facets'),  # Category counts and price histogram for the same filters
     path('inventory/low-stock/', LowStockItemsView.as_view(), name='low_stock_items'),
+    path('inventory/bulk-update/', InventoryBulkUpdateView.as_view(), name='inventory_bulk_update'),  # Change price, threshold or category of many items
+    path('inventory/forecasts/', InventoryForecastListView.as_view(), name='inventory_forecasts'),  # Consumption rate, days until stockout and suggested threshold per item
+    path('inventory/sync/', InventorySyncView.as_view(), name='inventory_sync'),  # Items changed or deleted since a sync cursor
 
     # Inventory Change Log Management
     path('inventory-change-logs/', InventoryChangeLogListView.as_view(), name='inventory_change_logs'),  # List all inventory change logs
     path('inventory-change-logs/<int:pk>/', InventoryChangeLogDetailView.as_view(), name='inventory_change_log_detail'),  # Retrieve an inventory change log
 
+    # Async read endpoints (served without a worker thread under ASGI/uvicorn)
+    path('async/categories/', AsyncCategoryListView.as_view(), name='async_category_list'),
+    path('async/categories/<int:pk>/', AsyncCategoryDetailView.as_view(), name='async_category_detail'),
+    path('async/inventory/', AsyncInventoryItemListView.as_view(), name='async_inventory_list'),
+    path('async/inventory/<int:pk>/', AsyncInventoryItemDetailView.as_view(), name='async_inventory_detail'),
+    path('async/inventory/low-stock/', AsyncLowStockItemsView.as_view(), name='async_low_stock_items'),
+    path('async/inventory/changes/', AsyncChangeFeedView.as_view(), name='inventory_change_feed'),  # Server-sent events stream of item changes
+    path('async/inventory-change-logs/', AsyncInventoryChangeLogListView.as_view(), name='async_inventory_change_logs'),
+    path('async/inventory-change-logs/<int:pk>/', AsyncInventoryChangeLogDetailView.as_view(), name='async_inventory_change_log_detail'),
+
+    # Several API requests in one round trip
+    path('batch/', BatchView.as_view(), name='batch'),  # Ordered sub-requests, optionally all-or-nothing
+
+    # Background jobs
+    path('jobs/', JobListCreateView.as_view(), name='job_list_create'),  # List jobs, or enqueue one (staff only)
+    path('jobs/<int:pk>/', JobDetailView.as_view(), name='job_detail'),  # Job status and progress; DELETE cancels a queued job
+
+    # Request profiles (staff only)
+    path('profiles/', ProfileListView.as_view(), name='profile_list'),  # List stored request profiles
+    path('profiles/<str:name>/', ProfileDownloadView.as_view(), name='profile_download'),  # Download a stored request profile
+
     # JWT Authentication Endpoints
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),  # JWT token obtain
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),  # JWT token refresh
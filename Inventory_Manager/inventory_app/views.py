@@ -1,18 +1,51 @@
+import io
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Floor
+from django.http import FileResponse
 from rest_framework import generics
 from rest_framework.filters import OrderingFilter, SearchFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
-from .models import Category, InventoryItem, InventoryChangeLog
+from .models import Category, InventoryItem, InventoryChangeLog, InventoryForecast, Job
 from django.contrib.auth import get_user_model
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.reverse import reverse
-from .serializers import UserRegistrationSerializer, UserSerializer, CategorySerializer, InventoryItemSerializer, InventoryChangeLogSerializer
+from rest_framework.exceptions import NotFound, ValidationError
+from .serializers import UserRegistrationSerializer, UserSerializer, CategorySerializer, InventoryItemSerializer, InventoryChangeLogSerializer, InventoryBulkUpdateSerializer, InventoryForecastSerializer, InventoryItemIdsSerializer, InventoryItemCodesSerializer, BatchSerializer, JobSerializer
 from .permissions import IsOwnerOrReadOnly, IsAdminOrReadOnly
+from .profiling import list_profiles, get_profile_path
+from .exceptions import PreconditionFailed, JobNotCancellable
+from .idempotency import IdempotentMixin
+from .bulk import bulk_update_items
+from .filters import InventoryChangeLogFilter, InventoryItemFilter, InventoryForecastFilter
+from .sync import get_changes
+from .provisioning import read_user_csv, validate_rows
+from .batch import run_batch
+from .deletion import soft_delete_items, soft_delete_user
+from .codes import item_code_cache, normalize_code
+from .jobs import cancel_job, enqueue
+from .autocomplete import autocomplete_index
 
 User = get_user_model()
 
+
+# Parse the item version from an If-Match header ('"3"', 'W/"3"' or '3'); None when absent or '*'
+def get_if_match_version(request):
+    header = request.headers.get('If-Match', '').strip()
+    if not header or header == '*':
+        return None
+    tag = header.split(',')[0].strip()
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise PreconditionFailed("If-Match must carry the ETag returned for this item.")
+
 # Root API views
 class ApiRootViewAuthenticated(APIView):
     permission_classes = [IsAuthenticated]
@@ -20,16 +53,24 @@ class ApiRootViewAuthenticated(APIView):
     def get(self, request, *args, **kwargs):
         return Response({
             'users': reverse('user_list_create', request=request),
+            'user_provision': reverse('user_provision', request=request),
             'profile': reverse('user_profile', request=request),
             'categories': reverse('category_list_create', request=request),
             'inventory_items': reverse('inventory_list_create', request=request),
             'inventory_levels': reverse('inventory_levels', request=request),
             'inventory_change_logs': reverse('inventory_change_logs', request=request),
             'low_stock_items': reverse('low_stock_items', request=request),
+            'inventory_bulk_update': reverse('inventory_bulk_update', request=request),
+            'inventory_sync': reverse('inventory_sync', request=request),
+            'inventory_facets': reverse('inventory_facets', request=request),
+            'inventory_forecasts': reverse('inventory_forecasts', request=request),
+            'batch': reverse('batch', request=request),
+            'jobs': reverse('job_list_create', request=request),
             'token': reverse('token_obtain_pair', request=request),
             'token_refresh': reverse('token_refresh', request=request),
             'token_verify': reverse('token_verify', request=request),
             'register': reverse('user_registration', request=request),
+            'profiles': reverse('profile_list', request=request),
         })
     
     # def get(self, request, *args, **kwargs):
@@ -39,21 +80,53 @@ class ApiRootViewAuthenticated(APIView):
 
 
 # User management views
-class UserRegistrationView(generics.CreateAPIView):
+class UserRegistrationView(IdempotentMixin, generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'registration'
 
-class UserListCreateView(generics.ListCreateAPIView):
-    queryset = User.objects.all()
+class UserListCreateView(IdempotentMixin, generics.ListCreateAPIView):
+    queryset = User.objects.filter(deleted_at__isnull=True)
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
 
-class UserDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = User.objects.all()
+class UserDetailView(IdempotentMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = User.objects.filter(deleted_at__isnull=True)
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
 
+    def perform_destroy(self, instance):
+        # Deactivated and hidden now; `manage.py purge_deleted` removes the account and its data
+        soft_delete_user(instance)
+
+# Staff-only bulk account creation from an uploaded CSV ("file" field), see provisioning.py.
+# Nothing is created when any row is invalid; ?dry_run=true only validates the file. The file
+# is validated here and the users are created by a provision_users job (hashing thousands of
+# passwords takes minutes): 202 with the job, whose result holds the outcome.
+class UserProvisionView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': ["Upload a CSV file."]})
+        try:
+            rows = read_user_csv(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''))
+        except ValueError as exc:
+            raise ValidationError({'file': [str(exc)]})
+        if len(rows) > settings.PROVISION_MAX_ROWS:
+            raise ValidationError({'file': [f"At most {settings.PROVISION_MAX_ROWS} users per upload; use `manage.py provision_users` for more."]})
+
+        _, errors = validate_rows(rows)
+        if errors:
+            return Response({'created': 0, 'errors': errors}, status=400)
+        if request.query_params.get('dry_run') in ('1', 'true'):
+            return Response({'created': 0, 'valid': len(rows)})
+        job = enqueue('provision_users', {'rows': rows}, created_by=request.user)
+        url = reverse('job_detail', args=[job.pk], request=request)
+        return Response({'valid': len(rows), 'job': JobSerializer(job, context={'request': request}).data}, status=202, headers={'Location': url})
+
 class UserProfileView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
@@ -62,33 +135,169 @@ class UserProfileView(generics.RetrieveAPIView):
         return self.request.user
 
 # Category views
-class CategoryListCreateView(generics.ListCreateAPIView):
+class CategoryListCreateView(IdempotentMixin, generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
 
-class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryDetailView(IdempotentMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminOrReadOnly]
 
+# Many items by id from one pk__in query, scoped by the view's get_queryset. Results follow the
+# request order (repeated ids repeat); ids that do not exist or belong to another user come
+# back as {"id": <id>, "not_found": true}.
+class InventoryItemMultiGetMixin:
+    def multi_get(self, ids):
+        serializer = InventoryItemIdsSerializer(data={'ids': ids})
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        items = self.get_queryset().select_related('category', 'owner').in_bulk(ids)
+        found = {row['id']: row for row in self.get_serializer(items.values(), many=True).data}
+        return Response({
+            'results': [found.get(pk, {'id': pk, 'not_found': True}) for pk in ids],
+            'not_found': sorted(set(ids) - set(found)),
+        })
+
+def split_ids(value):
+    # "1,2,3" from a query string
+    return [part.strip() for part in value.split(',') if part.strip()]
+
 # Inventory item views
-class InventoryItemListCreateView(generics.ListCreateAPIView):
+class InventoryItemListCreateView(IdempotentMixin, InventoryItemMultiGetMixin, generics.ListCreateAPIView):
     serializer_class = InventoryItemSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return InventoryItem.objects.none()
         if self.request.user.is_staff:
             return InventoryItem.objects.all()
         return InventoryItem.objects.filter(owner=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        # ?ids=1,2,3 fetches those items instead of a page of the list
+        if 'ids' in request.query_params:
+            return self.multi_get(split_ids(request.query_params['ids']))
+        return super().list(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         item_qty = serializer.validated_data.get('item_qty', 0)
         if item_qty < 0:
             raise serializer.ValidationError({"item_qty": "Item Quantity cannot be less than 0."})
         serializer.save(owner=self.request.user)
 
-class InventoryItemDetailView(generics.RetrieveUpdateDestroyAPIView):
+# Same as GET /api/inventory/?ids=, with the ids in a POST body for lists too long for a URL
+class InventoryItemMultiGetView(InventoryItemMultiGetMixin, generics.GenericAPIView):
+    serializer_class = InventoryItemSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return InventoryItem.objects.none()
+        if self.request.user.is_staff:
+            return InventoryItem.objects.all()
+        return InventoryItem.objects.filter(owner=self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        return self.multi_get(split_ids(request.query_params.get('ids', '')))
+
+    def post(self, request, *args, **kwargs):
+        return self.multi_get(request.data.get('ids') if isinstance(request.data, dict) else None)
+
+# Owner whose items a per-owner lookup searches: the requesting user, or ?owner=<user id> for staff
+def get_lookup_owner_id(request):
+    owner = request.query_params.get('owner')
+    if owner is None or not request.user.is_staff:
+        return request.user.pk
+    try:
+        return int(owner)
+    except ValueError:
+        raise ValidationError({'owner': ["A valid user id is required."]})
+
+# SKU/barcode lookups for scanners at the till. Codes are unique per owner, so a lookup is
+# scoped to the requesting user's items (staff may pass ?owner=<user id>). Recently scanned
+# codes are answered from the in-process LRU cache in codes.py; the rest take one indexed
+# query for all of them.
+class InventoryItemCodeMixin:
+    serializer_class = InventoryItemSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return InventoryItem.objects.none()
+        return InventoryItem.objects.filter(owner_id=self.get_owner_id())
+
+    def get_owner_id(self):
+        return get_lookup_owner_id(self.request)
+
+    def find_codes(self, codes):
+        """Serialized items by code, for those of ``codes`` that exist."""
+        # Item data holds absolute, per-user signed image URLs, hence the user and host in the key
+        scope = (self.request.user.pk, self.request.get_host(), self.get_owner_id())
+        found = {}
+        for code in codes:
+            data = item_code_cache.get(scope + (code,))
+            if data is not None:
+                found[code] = data
+        missing = [code for code in codes if code not in found]
+        if missing:
+            items = list(self.get_queryset().select_related('category', 'owner').filter(sku__in=missing))
+            rows = {item.sku: (item, data) for item, data in zip(items, self.get_serializer(items, many=True).data)}
+            # MySQL compares codes case-insensitively, so a row may answer a code spelled differently.
+            # Exact spellings win; a row that matched one exactly is not handed out for another.
+            folded = {sku.casefold(): row for sku, row in rows.items() if sku not in missing}
+            for code in missing:
+                row = rows.get(code) or folded.get(code.casefold())
+                if row is not None:
+                    item_code_cache.set(scope + (code,), row[0].pk, row[1])
+                    found[code] = row[1]
+        return found
+
+    def find_many(self, codes):
+        serializer = InventoryItemCodesSerializer(data={'codes': codes})
+        serializer.is_valid(raise_exception=True)
+        codes = serializer.validated_data['codes']
+        found = self.find_codes(codes)
+        return Response({
+            'results': [found.get(code, {'sku': code, 'not_found': True}) for code in codes],
+            'not_found': [code for code in codes if code not in found],
+        })
+
+class InventoryItemByCodeView(InventoryItemCodeMixin, generics.GenericAPIView):
+    def get(self, request, code, *args, **kwargs):
+        code = normalize_code(code)
+        data = self.find_codes([code]).get(code) if code else None
+        if data is None:
+            raise NotFound("No item with this SKU.")
+        return Response(data)
+
+# Many codes at once, in scan order: GET ?codes=a,b,c or POST {"codes": [...]}
+class InventoryItemByCodesView(InventoryItemCodeMixin, generics.GenericAPIView):
+    def get(self, request, *args, **kwargs):
+        return self.find_many(split_ids(request.query_params.get('codes', '')))
+
+    def post(self, request, *args, **kwargs):
+        return self.find_many(request.data.get('codes') if isinstance(request.data, dict) else None)
+
+# Typeahead for item pickers: ?q=<prefix>&limit=<n> returns up to n of the owner's items with a
+# word of the name starting with the prefix, from the in-memory index in autocomplete.py.
+# Unlike ?search= on the item lists there is no scan, COUNT or nested serialization.
+class InventoryAutocompleteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(max(int(request.query_params.get('limit', settings.AUTOCOMPLETE_LIMIT)), 1), 50)
+        except ValueError:
+            raise ValidationError({'limit': ["A valid integer is required."]})
+        suggestions = autocomplete_index.suggest(get_lookup_owner_id(request), request.query_params.get('q', ''), limit)
+        return Response({'results': [
+            {'id': pk, 'item_name': name, 'item_qty': qty} for pk, name, qty in suggestions
+        ]})
+
+class InventoryItemDetailView(IdempotentMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = InventoryItemSerializer
     permission_classes = [IsOwnerOrReadOnly]
 
@@ -100,55 +309,111 @@ class InventoryItemDetailView(generics.RetrieveUpdateDestroyAPIView):
         return InventoryItem.objects.filter(owner=self.request.user)
 
     def perform_update(self, serializer):
-    # Get old instance for comparison
-        old_instance = self.get_object()
-        updated_instance = serializer.save()
-
-        changes = {}
-        # Log quantity change if applicable
-        if old_instance.item_qty != updated_instance.item_qty:
-            changes['change_quantity'] = updated_instance.item_qty - old_instance.item_qty
-        # Log price change if applicable
-        if old_instance.item_price != updated_instance.item_price:
-            changes['change_price'] = updated_instance.item_price - old_instance.item_price
-
-        if changes:
-            InventoryChangeLog.objects.create(
-                inventory_item=updated_instance,
-                change_quantity=changes.get('change_quantity', None),
-                change_price=changes.get('change_price', None),
-                reason=self.request.data.get('reason', 'No reason provided'),
-                changed_by=self.request.user,
-                change_details=f"Changes: {changes}"
-            )
+        # Changes are logged by the serializer in the same transaction as the update
+        serializer.save(expected_version=get_if_match_version(self.request))
+
+    def perform_destroy(self, instance):
+        # Soft delete: the item disappears now, its change logs are purged later in chunks
+        expected_version = get_if_match_version(self.request)
+        items = InventoryItem.objects.filter(pk=instance.pk)
+        if expected_version is not None:
+            items = items.filter(version=expected_version)
+        if not soft_delete_items(items):
+            raise PreconditionFailed()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # Expose the row version so clients can send it back in If-Match
+        if response.status_code == 200 and isinstance(response.data, dict) and 'version' in response.data:
+            response['ETag'] = f'"{response.data["version"]}"'
+        return response
+
+class InventoryBulkUpdateView(IdempotentMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = InventoryBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        # Non-staff users can only touch their own items; other ids are reported as skipped
+        queryset = InventoryItem.objects.filter(pk__in=data['ids'])
+        if not request.user.is_staff:
+            queryset = queryset.filter(owner=request.user)
+        result = bulk_update_items(queryset, data['operation'], data['value'], request.user, data['reason'])
+        result['skipped'] += len(set(data['ids'])) - result['updated'] - result['skipped']
+        return Response(result)
+
+# Delta sync for offline clients: items created, updated or deleted since the cursor, in batches.
+# Keep calling with the returned cursor while "has_more" is true.
+class InventorySyncView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        items, deleted, cursor, has_more = get_changes(request.user, request.query_params.get('since') or None)
+        return Response({
+            'items': InventoryItemSerializer(items, many=True, context={'request': request}).data,
+            'deleted': deleted,
+            'cursor': cursor,
+            'has_more': has_more,
+        })
+
 # Inventory level views
 class InventoryLevelListView(generics.ListAPIView):
     queryset = InventoryItem.objects.all()
     serializer_class = InventoryItemSerializer
     permission_classes = [IsAuthenticated]  # Allow only authenticated users to access
+    throttle_scope = 'inventory_levels'
+    throttle_cost = 5  # Filtered, searched and counted over the whole catalog
 
-    # Filters: Category, Price Range, Low Stock
+    # Filters: Category, Price Range, Quantity Range, Date Added, Low Stock
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['category', 'item_price']  # Filtering by category and price range
-    search_fields = ['item_name']  # Search by item name
+    filterset_class = InventoryItemFilter
+    search_fields = ['item_name', '=sku']  # Search by item name or exact SKU
     ordering_fields = ['item_qty', 'item_price']  # Allow ordering by quantity or price
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
+# Facet counts for the items matching the same filters as InventoryLevelListView: items per
+# category and a price histogram with buckets of ?price_bucket_size=, from one grouped query.
+class InventoryFacetsView(InventoryLevelListView):
+
+    def get(self, request, *args, **kwargs):
+        try:
+            bucket_size = Decimal(request.query_params.get('price_bucket_size', settings.FACET_PRICE_BUCKET_SIZE))
+        except InvalidOperation:
+            bucket_size = Decimal(0)
+        if not bucket_size.is_finite() or bucket_size <= 0:
+            raise ValidationError({'price_bucket_size': ['Must be a positive number.']})
 
-        # Filter for items with quantity below their custom low stock threshold
-        low_stock = self.request.query_params.get('low_stock', None)
-        if low_stock:
-            queryset = queryset.filter(item_qty__lt=models.F('low_stock_threshold'))
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        rows = queryset.annotate(price_bucket=Floor(models.F('item_price') / bucket_size)).values(
+            'category_id', 'category__category', 'price_bucket',
+        ).annotate(count=models.Count('id'))
 
-        return queryset
+        categories, buckets = {}, {}
+        for row in rows:
+            category = categories.setdefault(row['category_id'], {'id': row['category_id'], 'name': row['category__category'], 'count': 0})
+            category['count'] += row['count']
+            buckets[row['price_bucket']] = buckets.get(row['price_bucket'], 0) + row['count']
+        return Response({
+            'count': sum(buckets.values()),
+            'categories': sorted(categories.values(), key=lambda category: -category['count']),
+            'price_histogram': [
+                {'min': int(bucket) * bucket_size, 'max': (int(bucket) + 1) * bucket_size, 'count': count}
+                for bucket, count in sorted(buckets.items())
+            ],
+        })
 
 # Inventory change log views
 class InventoryChangeLogListView(generics.ListAPIView):
     serializer_class = InventoryChangeLogSerializer
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'change_logs'
+    throttle_cost = 5  # Nested item serialization for every row
+    filterset_class = InventoryChangeLogFilter
 
     def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return InventoryChangeLog.objects.none()
         if self.request.user.is_staff:
             return InventoryChangeLog.objects.all()
         return InventoryChangeLog.objects.filter(changed_by=self.request.user)
@@ -170,4 +435,91 @@ class LowStockItemsView(generics.ListAPIView):
 
     def get_queryset(self):
         # Filter items where the quantity is less than the low stock threshold
-        return InventoryItem.objects.filter(item_qty__lt=models.F('low_stock_threshold'))
\ No newline at end of file
+        return InventoryItem.objects.filter(item_qty__lt=models.F('low_stock_threshold'))
+
+# Consumption forecasts computed by `manage.py forecast_inventory`, soonest stockout first
+class InventoryForecastListView(generics.ListAPIView):
+    serializer_class = InventoryForecastSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_class = InventoryForecastFilter
+    ordering_fields = ['days_until_stockout', 'daily_consumption', 'suggested_threshold']
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return InventoryForecast.objects.none()
+        queryset = InventoryForecast.objects.select_related('item').filter(item__deleted_at__isnull=True).order_by(models.F('days_until_stockout').asc(nulls_last=True), 'item_id')
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(item__owner=self.request.user)
+
+# Runs an ordered list of API sub-requests in one round trip, in-process and as the batch's user.
+# With "atomic": true they share one transaction and stop at the first failure, which rolls
+# back the others; requests that did not run get status 424.
+class BatchView(IdempotentMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    batchable = False
+
+    def post(self, request, *args, **kwargs):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        responses, committed = run_batch(request, serializer.validated_data['requests'], serializer.validated_data['atomic'])
+        return Response({'responses': responses, 'committed': committed})
+
+# Background jobs, run by `manage.py run_jobs`. Staff enqueue them; users can follow the
+# status and progress of jobs started on their behalf.
+class JobListCreateView(generics.ListCreateAPIView):
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['status', 'task']
+    ordering_fields = ['created_at', 'finished_at']
+    ordering = ['-created_at']
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Job.objects.none()
+        if self.request.user.is_staff:
+            return Job.objects.all()
+        return Job.objects.filter(created_by=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+# DELETE cancels a job that has not started yet
+class JobDetailView(generics.RetrieveDestroyAPIView):
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return Job.objects.none()
+        if self.request.user.is_staff:
+            return Job.objects.all()
+        return Job.objects.filter(created_by=self.request.user)
+
+    def destroy(self, request, *args, **kwargs):
+        job = self.get_object()
+        if not cancel_job(job.pk):
+            raise JobNotCancellable()
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data)
+
+# Request profiling views (staff only)
+class ProfileListView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        profiles = list_profiles()
+        for profile in profiles:
+            profile['url'] = reverse('profile_download', kwargs={'name': profile['name']}, request=request)
+        return Response(profiles)
+
+class ProfileDownloadView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, name, *args, **kwargs):
+        path = get_profile_path(name)
+        if path is None:
+            raise NotFound("Profile not found.")
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)